@@ -1,11 +1,61 @@
-from fastapi import FastAPI, Query, HTTPException
-from sentence_transformers import SentenceTransformer
-import faiss
+from fastapi import FastAPI, Header, Query, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 import json
-from typing import List, Dict, Optional
-from pydantic import BaseModel
+import asyncio
+import logging
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel, Field
 import os
-from init_vectorstore import init_vectorstore, assessments
+import random
+import threading
+from init_vectorstore import INDEX_DIR, INDEX_MMAP, METADATA_FILE, init_vectorstore
+from batching import MicroBatcher
+from cache import (SEMANTIC_CACHE_AUDIT_RATE, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD,
+                   LRUCache, ResultCache, SemanticCache, cached_encode, normalize_query)
+from search import DENSE_WEIGHT, LEXICAL_CANDIDATES, LEXICAL_WEIGHT, SearchRequest, hybrid_search
+from rerank import RERANK_CANDIDATES, RERANK_ENABLED, CrossEncoderReranker
+from metrics import REGISTRY, STAGE_SECONDS, Counter, Gauge, Histogram, SamplingProfiler, span
+from snapshot import Snapshot, SnapshotManager
+from precompute import PrecomputedTable, refresh_table
+
+logger = logging.getLogger(__name__)
+
+# Inference executor settings
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_PENDING = int(os.environ.get("INFERENCE_MAX_PENDING", "32"))
+
+# Micro-batching settings
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "5"))
+
+# Batch endpoint settings
+BATCH_REQUEST_MAX_QUERIES = int(os.environ.get("BATCH_REQUEST_MAX_QUERIES", "1000"))
+BATCH_REQUEST_CHUNK = int(os.environ.get("BATCH_REQUEST_CHUNK", "128"))
+
+# Cache settings (TTL in seconds)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "3600"))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "300"))
+
+# Cross-encoder re-ranking deadline. Requests arriving with less than this left keep
+# their first-stage ranking, so re-ranking never blows the latency budget.
+RERANK_DEADLINE_MS = float(os.environ.get("RERANK_DEADLINE_MS", "250"))
+
+# Index hot reload. The admin endpoints are hidden unless ADMIN_TOKEN is set; with
+# RELOAD_WATCH_INTERVAL > 0 the catalog and index files are polled for changes.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+RELOAD_WATCH_INTERVAL = float(os.environ.get("RELOAD_WATCH_INTERVAL", "0"))
+
+# Precomputed results for canonical queries (see precompute.py), used when the table exists
+PRECOMPUTED_ENABLED = os.environ.get("PRECOMPUTED_ENABLED", "1") == "1"
+
+# Runtime sampling profiler, off unless enabled
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "5"))
 
 app = FastAPI(
     title="SHL Assessment Recommender API",
@@ -20,6 +70,96 @@ except Exception as e:
     print(f"Error initializing model: {str(e)}")
     raise
 
+# The index with its columnar catalog, attribute bitmaps, BM25 index and embedding rows.
+# Requests read all of them from one snapshot, which a reload replaces as a whole.
+snapshots = SnapshotManager(model, Snapshot(index, metadata))
+del index, metadata  # so a swapped-out index can be freed
+
+# Query embeddings, and final results keyed on the index version
+query_cache = LRUCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+result_cache = ResultCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, version=snapshots.current.version)
+semantic_cache = SemanticCache(maxsize=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=RESULT_CACHE_TTL,
+                               version=snapshots.current.version) if SEMANTIC_CACHE_ENABLED else None
+
+# The cross-encoder is loaded per worker at startup (see `warm_up_reranker`), not here: under
+# gunicorn this runs in the preloaded master, and torch thread pools don't survive fork()
+reranker = CrossEncoderReranker(None, lambda ids: snapshots.current.texts(ids)) if RERANK_ENABLED else None
+
+# Ranked IDs for canonical queries, answered without the model; only used while its version is live
+precomputed: Optional[PrecomputedTable] = None
+
+def refresh_precomputed(snapshot: Snapshot):
+    """Load the precomputed table for `snapshot`, recomputing it from its stored queries if it's stale.
+
+    Workers refreshing after the same swap take turns on a lock file: one recomputes and
+    publishes the table, and the rest load it.
+    """
+    global precomputed
+    if snapshot is not snapshots.current:
+        return  # superseded by a later swap, which started its own refresh
+    try:
+        table = refresh_table(model, snapshot, reranker)
+    except Exception:
+        logger.exception("Refreshing precomputed results failed")
+        return
+    if table is not None and table.version == snapshots.current.version:
+        precomputed = table
+        logger.info(f"Serving {len(table)} precomputed results for {len(table.queries)} queries")
+
+def start_precomputed_refresh(snapshot: Snapshot):
+    if PRECOMPUTED_ENABLED:
+        threading.Thread(target=refresh_precomputed, args=(snapshot,), name="precompute", daemon=True).start()
+
+def on_swap(snapshot: Snapshot):
+    """Drop results and cross-encoder scores computed against the previous version"""
+    result_cache.set_version(snapshot.version)
+    if semantic_cache is not None:
+        semantic_cache.set_version(snapshot.version)
+    if reranker is not None:
+        reranker.scores.clear()
+    start_precomputed_refresh(snapshot)
+
+snapshots.on_swap(on_swap)
+
+# Encoding and search are CPU-bound, so they run here instead of on the event loop
+executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+pending_inference = 0
+
+# Prometheus metrics; stage timings come from `span` in here, search.py and init_vectorstore.py
+caches = {"query": query_cache, "result": result_cache}
+if semantic_cache is not None:
+    caches["semantic"] = semantic_cache
+if reranker is not None:
+    caches["rerank_scores"] = reranker.scores
+REQUEST_SECONDS = Histogram("shl_request_seconds", "End-to-end request latency", labelnames=("endpoint", "status"))
+PRECOMPUTED_LOOKUPS = Counter("shl_precomputed_total", "Lookups in the precomputed results table",
+                              labelnames=("outcome",))
+RERANK_OUTCOMES = Counter("shl_rerank_total", "Re-ranked queries, by whether the deadline forced a fallback",
+                          labelnames=("outcome",))
+if semantic_cache is not None:
+    Counter("shl_semantic_cache_audits_total", "Semantic cache hits checked against a real search",
+            labelnames=("outcome",), function=lambda: {"correct": semantic_cache.audits - semantic_cache.false_hits,
+                                                       "false_hit": semantic_cache.false_hits})
+BATCH_SIZE = Histogram("shl_batch_size", "Queries per search batch", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+Counter("shl_cache_hits_total", "Cache hits", labelnames=("cache",),
+        function=lambda: {name: c.hits for name, c in caches.items()})
+Counter("shl_cache_misses_total", "Cache misses", labelnames=("cache",),
+        function=lambda: {name: c.misses for name, c in caches.items()})
+Counter("shl_cache_evictions_total", "Cache evictions", labelnames=("cache",),
+        function=lambda: {name: c.evictions for name, c in caches.items()})
+Gauge("shl_cache_hit_ratio", "Cache hits over lookups since startup", labelnames=("cache",),
+      function=lambda: {name: c.stats()["hit_rate"] for name, c in caches.items()})
+Gauge("shl_cache_entries", "Entries held in each cache", labelnames=("cache",),
+      function=lambda: {name: len(c) for name, c in caches.items()})
+Gauge("shl_index_vectors", "Vectors in the FAISS index", function=lambda: snapshots.current.index.ntotal)
+Gauge("shl_index_embedding_bytes", "Size of the embedding matrix", function=lambda: snapshots.current.embeddings.nbytes)
+Gauge("shl_lexical_terms", "Terms in the BM25 vocabulary", function=lambda: len(snapshots.current.lexical_index.terms))
+Gauge("shl_index_loaded_timestamp_seconds", "When the live index version was loaded",
+      function=lambda: snapshots.current.loaded_at)
+Counter("shl_index_swaps_total", "Index versions swapped in since startup", function=lambda: snapshots.swaps)
+Gauge("shl_pending_requests", "Requests waiting for inference", function=lambda: pending_inference)
+profiler = SamplingProfiler()
+
 class Assessment(BaseModel):
     name: str
     url: str
@@ -33,60 +173,461 @@ class RecommendationResponse(BaseModel):
     query: str
     recommendations: List[Assessment]
     total_results: int
+    index_version: str
+
+class BatchQuery(BaseModel):
+    query: str = Field(..., description="Search query or job description")
+    max_results: int = Field(default=10, le=10, ge=1, description="Maximum number of results")
+    max_duration: Optional[int] = Field(default=60, le=120, ge=15, description="Maximum assessment duration in minutes")
+    dense_weight: float = Field(default=DENSE_WEIGHT, ge=0, description="Weight of the semantic ranking in fusion")
+    lexical_weight: float = Field(default=LEXICAL_WEIGHT, ge=0, description="Weight of the keyword (BM25) ranking in fusion")
+    min_duration: Optional[int] = Field(default=None, ge=0, description="Minimum assessment duration in minutes")
+    remote_testing: Optional[bool] = Field(default=None, description="Only assessments with (or without) remote testing")
+    adaptive: Optional[bool] = Field(default=None, description="Only adaptive (or non-adaptive) assessments")
+    test_types: List[str] = Field(default=[], description="Test type codes, e.g. [\"K\", \"P\"]")
+    all_test_types: bool = Field(default=False, description="Require every listed test type instead of any")
+    rerank: Optional[bool] = Field(default=None, description="Re-score the top candidates with the cross-encoder")
+
+    def to_request(self) -> SearchRequest:
+        return make_request(self.query, self.max_results, self.max_duration, self.dense_weight, self.lexical_weight,
+                            self.min_duration, self.remote_testing, self.adaptive, self.test_types,
+                            self.all_test_types, self.rerank)
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=BATCH_REQUEST_MAX_QUERIES)
+
+class BatchResponse(BaseModel):
+    results: List[RecommendationResponse]
+    total_queries: int
+
+def format_results(ids: np.ndarray, snapshot: Snapshot) -> List[Assessment]:
+    """Turn ranked assessment IDs into response models"""
+    # Columns are already typed, so the models are constructed without re-validation
+    catalog = snapshot.catalog
+    return [Assessment.model_construct(**record) for record in catalog.records(catalog.rows_for(ids))]
+
+def rank(snapshot: Snapshot, requests: List[SearchRequest], query_embeddings: np.ndarray,
+         deadlines: Optional[List[float]] = None) -> Tuple[List[np.ndarray], List[bool]]:
+    """Ranked IDs per request, and whether each may be cached: results that fell back
+    to the first stage at their re-ranking deadline may not"""
+    # Re-ranked requests fetch a larger first-stage candidate set
+    first_stage = [r._replace(max_results=max(r.max_results, RERANK_CANDIDATES)) if r.rerank else r
+                   for r in requests]
+
+    # Attribute filtering happens inside the search; names were deduplicated at build time
+    results = hybrid_search(
+        snapshot.index,
+        snapshot.attribute_filter,
+        snapshot.lexical_index,
+        snapshot.embeddings,
+        query_embeddings,
+        first_stage,
+        lexical_candidates=LEXICAL_CANDIDATES
+    )
+    cacheable = [True] * len(requests)
+
+    rerank_rows = [row for row, r in enumerate(requests) if r.rerank]
+    if rerank_rows:
+        with span("rerank"):
+            reranked = reranker.rerank(
+                [requests[row].query for row in rerank_rows],
+                [results[row] for row in rerank_rows],
+                [deadlines[row] if deadlines else None for row in rerank_rows],
+                snapshot.texts
+            )
+        for row, (ids, complete) in zip(rerank_rows, reranked):
+            results[row] = ids
+            cacheable[row] = complete
+            RERANK_OUTCOMES.inc(outcome="reranked" if complete else "fallback")
+
+    return [ids[:r.max_results] for ids, r in zip(results, requests)], cacheable
+
+def semantic_key(request: SearchRequest) -> Tuple:
+    """Everything but the query text has to match for a semantic cache hit"""
+    return tuple(request._replace(query=""))
+
+def search_batch(requests: List[SearchRequest],
+                 deadlines: Optional[List[float]] = None) -> List[Tuple[List[Assessment], bool, str]]:
+    """Encode a batch of requests and search them together.
+
+    Returns each request's results, whether they may be cached, and the index
+    version they came from. Queries close enough to a recent one with the same
+    filters reuse its results from the semantic cache, skipping search, re-ranking
+    and formatting.
+    """
+    BATCH_SIZE.observe(len(requests))
+    # The whole batch runs on the snapshot live now, even if a reload swaps it meanwhile
+    snapshot = snapshots.current
+
+    # Encode all uncached queries in one call
+    with span("encode"):
+        query_embeddings = cached_encode(model, [r.query for r in requests], query_cache)
+
+    hits = [None] * len(requests)
+    if semantic_cache is not None and semantic_cache.version == snapshot.version:
+        with span("semantic_cache"):
+            hits = semantic_cache.get(query_embeddings, [semantic_key(r) for r in requests])
+    # A sample of hits is searched anyway, to measure how often the reused results are wrong
+    audited = [hit is not None and random.random() < SEMANTIC_CACHE_AUDIT_RATE for hit in hits]
+    rows = [row for row, hit in enumerate(hits) if hit is None or audited[row]]
+
+    results: List[Optional[Tuple[List[Assessment], bool, str]]] = [
+        (hit[0], True, snapshot.version) if hit is not None else None for hit in hits]
+    if rows:
+        ranked, cacheable = rank(snapshot, [requests[row] for row in rows], query_embeddings[rows],
+                                 [deadlines[row] for row in rows] if deadlines else None)
+        with span("format"):
+            formatted = [format_results(ids, snapshot) for ids in ranked]
+
+        for row, recommendations, ok in zip(rows, formatted, cacheable):
+            if audited[row]:
+                semantic_cache.record_audit(hits[row][1], recommendations == hits[row][0])
+            elif semantic_cache is not None and ok:
+                semantic_cache.put(query_embeddings[row], semantic_key(requests[row]), recommendations,
+                                   snapshot.version)
+            results[row] = (recommendations, ok, snapshot.version)
+
+    return results
+
+def search_items(items: List[Tuple[SearchRequest, float]]) -> List[Tuple[List[Assessment], bool, str]]:
+    """Micro-batcher entry point: requests paired with their re-ranking deadlines"""
+    requests, deadlines = zip(*items)
+    return search_batch(list(requests), list(deadlines))
+
+batcher = MicroBatcher(
+    search_items,
+    executor,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_WINDOW_MS,
+    max_concurrent_batches=INFERENCE_WORKERS,
+    observe_wait=lambda wait: STAGE_SECONDS.observe(wait, stage="queue_wait")
+)
+
+def check_capacity():
+    """Reject new work with 503 once INFERENCE_MAX_PENDING requests are waiting"""
+    if pending_inference >= INFERENCE_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+
+def check_weights(dense_weight: float, lexical_weight: float):
+    """At least one ranking has to contribute to the fused score"""
+    if dense_weight <= 0 and lexical_weight <= 0:
+        raise HTTPException(status_code=422, detail="dense_weight and lexical_weight cannot both be 0")
+
+def parse_test_types(values: List[str]) -> Tuple[str, ...]:
+    """Normalize test type codes, given repeated or comma-separated, into a sorted tuple"""
+    codes = {code.strip().upper() for value in values for code in value.split(",") if code.strip()}
+    catalog = snapshots.current.catalog
+    unknown = sorted(codes - set(catalog.type_codes))
+    if unknown:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown test types {unknown}, expected some of {sorted(catalog.type_codes)}"
+        )
+    return tuple(sorted(codes))
+
+def make_request(query: str, max_results: int, max_duration: Optional[int], dense_weight: float,
+                 lexical_weight: float, min_duration: Optional[int] = None, remote_testing: Optional[bool] = None,
+                 adaptive: Optional[bool] = None, test_types: List[str] = (),
+                 all_test_types: bool = False, rerank: Optional[bool] = None) -> SearchRequest:
+    """Validate the filters and build the search request"""
+    check_weights(dense_weight, lexical_weight)
+    if min_duration is not None and max_duration is not None and min_duration > max_duration:
+        raise HTTPException(status_code=422, detail="min_duration cannot exceed max_duration")
+    if rerank is None:
+        rerank = reranker is not None
+    elif rerank and reranker is None:
+        raise HTTPException(status_code=422, detail="Re-ranking is disabled, set RERANK_ENABLED=1")
+    return SearchRequest(query, max_results, max_duration, dense_weight, lexical_weight, min_duration,
+                         remote_testing, adaptive, parse_test_types(test_types), all_test_types, rerank)
+
+def rerank_deadline() -> float:
+    """Deadline for re-ranking a request arriving now"""
+    return time.perf_counter() + RERANK_DEADLINE_MS / 1000
+
+def result_key(version: str, request: SearchRequest) -> Tuple:
+    """Result cache key; the version keeps a search that straddled a reload from caching stale results"""
+    return (version,) + request.cache_key(normalize_query)
+
+def lookup_cached(request: SearchRequest, snapshot: Snapshot) -> Optional[List[Assessment]]:
+    """Results from the result cache or the precomputed table, without encoding or searching"""
+    key = result_key(snapshot.version, request)
+    with span("result_cache"):
+        cached = result_cache.get(key)
+    table = precomputed
+    if cached is not None or table is None or table.version != snapshot.version:
+        return cached
+
+    with span("precomputed"):
+        ids = table.lookup(request)
+        PRECOMPUTED_LOOKUPS.inc(outcome="hit" if ids is not None else "miss")
+        if ids is None:
+            return None
+        # Formatting costs more than the lookup, so repeats are served formatted from the result cache
+        recommendations = format_results(ids, snapshot)
+    result_cache.put(key, recommendations)
+    return recommendations
+
+async def run_inference(request: SearchRequest, deadline: float) -> Tuple[List[Assessment], str]:
+    """Serve from the precomputed table or result cache, or queue a search on the micro-batcher.
+    Returns the results and the index version that produced them."""
+    global pending_inference
+    snapshot = snapshots.current
+    cached = lookup_cached(request, snapshot)
+    if cached is not None:
+        return cached, snapshot.version
+
+    check_capacity()
+    pending_inference += 1
+    try:
+        recommendations, cacheable, version = await batcher.submit((request, deadline))
+    finally:
+        pending_inference -= 1
+
+    if cacheable:
+        result_cache.put(result_key(version, request), recommendations)
+    return recommendations, version
 
 @app.get("/recommend", response_model=RecommendationResponse, tags=["Recommendations"])
 async def get_recommendations(
     query: str = Query(..., description="Search query or job description"),
     max_results: Optional[int] = Query(default=10, le=10, ge=1, description="Maximum number of results"),
-    max_duration: Optional[int] = Query(default=60, le=120, ge=15, description="Maximum assessment duration in minutes")
+    max_duration: Optional[int] = Query(default=60, le=120, ge=15, description="Maximum assessment duration in minutes"),
+    dense_weight: float = Query(default=DENSE_WEIGHT, ge=0, description="Weight of the semantic ranking in fusion"),
+    lexical_weight: float = Query(default=LEXICAL_WEIGHT, ge=0, description="Weight of the keyword (BM25) ranking in fusion"),
+    min_duration: Optional[int] = Query(default=None, ge=0, description="Minimum assessment duration in minutes"),
+    remote_testing: Optional[bool] = Query(default=None, description="Only assessments with (or without) remote testing"),
+    adaptive: Optional[bool] = Query(default=None, description="Only adaptive (or non-adaptive) assessments"),
+    test_types: List[str] = Query(default=[], description="Test type codes (A, B, C, D, E, K, P, S), repeated or comma-separated"),
+    all_test_types: bool = Query(default=False, description="Require every listed test type instead of any"),
+    rerank: Optional[bool] = Query(default=None, description="Re-score the top candidates with the cross-encoder (default: on when RERANK_ENABLED=1)")
 ):
     """
     Get assessment recommendations based on query text.
     
+    Results fuse semantic similarity and BM25 keyword matches with reciprocal rank
+    fusion; set `lexical_weight=0` for purely semantic ranking. Filters on duration,
+    remote testing, adaptivity and test types are applied inside the index search.
+    With `rerank`, the top candidates are re-scored by a cross-encoder within the
+    RERANK_DEADLINE_MS budget.
+    
     Examples:
     - /recommend?query=java developer
     - /recommend?query=python developer&max_results=5&max_duration=45
+    - /recommend?query=Python, SQL and JavaScript&lexical_weight=2
+    - /recommend?query=sales manager&test_types=P,S&remote_testing=true&min_duration=20
     """
+    deadline = rerank_deadline()
+    request = make_request(query, max_results, max_duration, dense_weight, lexical_weight,
+                           min_duration, remote_testing, adaptive, test_types, all_test_types, rerank)
     try:
-        # Encode query
-        query_embedding = model.encode([query])
-        
-        # Search
-        distances, indices = index.search(query_embedding.astype('float32'), k=len(metadata))  # Get all results first
+        recommendations, version = await run_inference(request, deadline)
         
-        # Format results and remove duplicates
-        seen_names = set()
-        recommendations = []
-        
-        for idx in indices[0]:
-            if idx < len(metadata):
-                result = metadata[idx]
-                name = result['name']
-                
-                if name not in seen_names and (max_duration is None or result.get('duration', 0) <= max_duration):
-                    seen_names.add(name)
-                    recommendations.append(Assessment(
-                        name=result['name'],
-                        url=result['url'],
-                        remote_testing=result['remote_testing'],
-                        adaptive=result['adaptive'],
-                        test_types=result['test_types'],
-                        description=result.get('description', ''),
-                        duration=result.get('duration', 0)
-                     ))
-                    
-                    if len(recommendations) >= max_results:
-                        break
-        
-        return RecommendationResponse(
-            query=query,
-            recommendations=recommendations[:max_results],  # Limit to max_results
-            total_results=len(recommendations)
-        )
+        # Serialized here, rather than re-validated by FastAPI, so the cost shows up as its own stage
+        with span("serialize"):
+            body = RecommendationResponse(
+                query=query,
+                recommendations=recommendations,
+                total_results=len(recommendations),
+                index_version=version
+            ).model_dump_json()
+        return Response(content=body, media_type="application/json", headers={"X-Index-Version": version})
         
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception(f"Recommendation failed for query {query!r}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def batch_responses(queries: List[BatchQuery]) -> AsyncIterator[RecommendationResponse]:
+    """Yield responses for `queries` in order.
+
+    Queries are processed BATCH_REQUEST_CHUNK at a time, each chunk with one
+    encode call and one matrix search, so large batches are never held in memory at once.
+    """
+    global pending_inference
+    loop = asyncio.get_running_loop()
+
+    for start in range(0, len(queries), BATCH_REQUEST_CHUNK):
+        chunk = queries[start:start + BATCH_REQUEST_CHUNK]
+        deadline = rerank_deadline()
+        requests = [q.to_request() for q in chunk]
+        snapshot = snapshots.current
+        results = [lookup_cached(r, snapshot) for r in requests]
+        versions = [snapshot.version] * len(chunk)
+
+        misses = [i for i, cached in enumerate(results) if cached is None]
+        if misses:
+            pending_inference += 1
+            try:
+                searched = await loop.run_in_executor(executor, search_batch, [requests[i] for i in misses],
+                                                      [deadline] * len(misses))
+            finally:
+                pending_inference -= 1
+
+            for i, (recommendations, cacheable, searched_version) in zip(misses, searched):
+                if cacheable:
+                    result_cache.put(result_key(searched_version, requests[i]), recommendations)
+                results[i] = recommendations
+                versions[i] = searched_version
+
+        for q, recommendations, version in zip(chunk, results, versions):
+            yield RecommendationResponse(
+                query=q.query,
+                recommendations=recommendations,
+                total_results=len(recommendations),
+                index_version=version
+            )
+
+@app.post("/recommend/batch", response_model=BatchResponse, tags=["Recommendations"])
+async def get_batch_recommendations(
+    request: BatchRequest,
+    stream: bool = Query(default=False, description="Stream one JSON response per line (NDJSON) as results are ready")
+):
+    """
+    Get recommendations for many queries in one call, returned in request order.
+    
+    Example body:
+    {"queries": [{"query": "java developer", "max_results": 5}, {"query": "analyst", "max_duration": 45}]}
+    """
+    for q in request.queries:
+        q.to_request()  # raises 422 for invalid filters before any work starts
+    check_capacity()
+
+    if stream:
+        async def ndjson():
+            try:
+                async for response in batch_responses(request.queries):
+                    yield response.model_dump_json() + "\n"
+            except Exception as e:
+                # Headers are already sent, so report the failure in-band
+                yield json.dumps({"error": str(e)}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    try:
+        results = [response async for response in batch_responses(request.queries)]
+        return BatchResponse(results=results, total_queries=len(results))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Record end-to-end latency per endpoint and status"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        path = request.url.path
+        endpoint = path if path in ROUTE_PATHS else "other"  # unknown paths would explode label cardinality
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, status=status)
+
+@app.get("/metrics", tags=["Info"], response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms, cache, batching and index metrics in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def check_profiler():
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler is disabled, set PROFILER_ENABLED=1")
+
+@app.get("/profiler", tags=["Info"])
+async def profiler_status():
+    """Whether the sampling profiler is running and how much it has collected"""
+    check_profiler()
+    return profiler.status()
+
+@app.post("/profiler/start", tags=["Info"])
+async def start_profiler(
+    interval_ms: float = Query(default=PROFILER_INTERVAL_MS, ge=1, le=1000, description="Sampling interval")
+):
+    """Start sampling every thread's stack, discarding the previous profile"""
+    check_profiler()
+    profiler.start(interval_ms)
+    return profiler.status()
+
+@app.post("/profiler/stop", tags=["Info"], response_class=PlainTextResponse)
+async def stop_profiler():
+    """Stop sampling and return the profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    check_profiler()
+    return PlainTextResponse(profiler.stop())
+
+def check_admin(token: Optional[str]):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled, set ADMIN_TOKEN")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/reload", tags=["Admin"])
+async def reload_status(x_admin_token: Optional[str] = Header(default=None)):
+    """Live index version and the state of the last reload"""
+    check_admin(x_admin_token)
+    return snapshots.status()
+
+@app.post("/admin/reload", status_code=202, tags=["Admin"])
+async def reload_index(
+    rebuild: bool = Query(default=False, description="Re-encode the whole catalog instead of updating the index"),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    Reload the index in the background and swap it in when ready.
+    
+    The catalog is re-read and the index updated if it changed; requests keep
+    being served from the current version until the swap, and requests already
+    in flight finish on it. Poll `GET /admin/reload` for the outcome.
+    """
+    check_admin(x_admin_token)
+    if not snapshots.reload(rebuild):
+        raise HTTPException(status_code=409, detail="A reload is already running")
+    return snapshots.status()
+
+@app.on_event("startup")
+def warm_up_reranker():
+    """Load the cross-encoder and time one forward pass, in each worker process"""
+    if reranker is not None:
+        reranker.warm_up()
+
+@app.on_event("startup")
+def load_precomputed():
+    """Load (or recompute) the precomputed table in each worker; a thread started in the
+    preloaded master would not survive fork()"""
+    start_precomputed_refresh(snapshots.current)
+
+@app.on_event("startup")
+def start_watching():
+    """Poll for catalog and index changes, in each worker process"""
+    if RELOAD_WATCH_INTERVAL > 0:
+        # Workers sharing a memory-mapped index only follow the sidecar, so they don't all
+        # rebuild at once; the new index is built once with `python init_vectorstore.py`
+        paths = [os.path.join(INDEX_DIR, METADATA_FILE)] if INDEX_MMAP else None
+        snapshots.watch(RELOAD_WATCH_INTERVAL, paths)
+
+@app.get("/stats", tags=["Info"])
+async def stats():
+    """Micro-batching and cache metrics"""
+    return {
+        "pending_requests": pending_inference,
+        "batching": batcher.stats(),
+        "query_cache": query_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "rerank": reranker.stats() if reranker is not None else None,
+        "index": snapshots.status(),
+        "precomputed": precomputed.stats() if precomputed is not None else None
+    }
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    """Stop the batcher and inference workers"""
+    batcher.close()
+    executor.shutdown(wait=False, cancel_futures=True)
+
 @app.get("/", tags=["Info"])
 async def root():
     """API root endpoint with basic information"""
@@ -95,10 +636,17 @@ async def root():
         "version": "1.0.0",
         "documentation": "/docs",
         "endpoints": {
-            "recommend": "/recommend?query=your_query_here"
+            "recommend": "/recommend?query=your_query_here",
+            "recommend_filtered": "/recommend?query=your_query_here&test_types=K&remote_testing=true",
+            "recommend_batch": "POST /recommend/batch",
+            "stats": "/stats",
+            "metrics": "/metrics",
+            "reload": "POST /admin/reload (X-Admin-Token header)"
         }
     }
 
+ROUTE_PATHS = {route.path for route in app.routes}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,20 +1,38 @@
 # app.py
 
+import random
 import streamlit as st
-import faiss
-import json
-import numpy as np
-import pandas as pd
-import requests
-from sentence_transformers import SentenceTransformer
-from bs4 import BeautifulSoup
-from typing import Union, List, Dict
+from typing import TYPE_CHECKING, Union, Dict
+from cache import (SEMANTIC_CACHE_AUDIT_RATE, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD,
+                   LRUCache, ResultCache, SemanticCache, cached_encode, normalize_query)
+from chunking import max_sim_search
+from indexes import search_index
+
+# pandas and the page fetcher are imported where they are used to keep startup light
+if TYPE_CHECKING:
+    import pandas as pd
+
+@st.cache_resource
+def get_caches():
+    """Query embedding, result and semantic result caches shared across reruns and sessions.
+
+    The semantic cache returns approximate matches, so like the API's it is off (None)
+    unless SEMANTIC_CACHE_ENABLED=1.
+    """
+    semantic_cache = SemanticCache(maxsize=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD, ttl=300) \
+        if SEMANTIC_CACHE_ENABLED else None
+    return LRUCache(maxsize=256, ttl=3600), ResultCache(maxsize=256, ttl=300), semantic_cache
 
 @st.cache_resource(show_spinner="Loading model...")
 def load_model_and_index():
     try:
-        from init_vectorstore import init_vectorstore, assessments
+        from init_vectorstore import init_vectorstore, assessments, catalog_hash
         index, model, metadata = init_vectorstore()
+        # Drop results computed against a previous index
+        version = catalog_hash(metadata)
+        get_caches()[1].set_version(version)
+        if get_caches()[2] is not None:
+            get_caches()[2].set_version(version)
         return model, index, metadata
     except Exception as e:
         if "429" in str(e):
@@ -23,26 +41,54 @@ def load_model_and_index():
             st.error(f"Error loading model: {str(e)}")
         return None, None, None
 
+@st.cache_resource
+def get_fetcher():
+    """Pooled, cached page fetcher shared across reruns and sessions"""
+    from fetcher import BackgroundFetcher
+    return BackgroundFetcher()
+
 def extract_text_from_url(url: str) -> str:
     """Extract text content from URL"""
     try:
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return ' '.join([p.text for p in soup.find_all('p')])
-    except:
+        return get_fetcher().fetch(url)
+    except Exception as e:
+        st.warning(f"Could not read the job description: {str(e)}")
         return ""
 
-def get_recommendations(query: str, model, index, metadata: List[Dict], 
-                       k: int = 10, max_duration: Union[int, None] = None) -> pd.DataFrame:
-    """Get recommendations based on query"""
-    query_embedding = model.encode([query])
-    query_embedding = np.array(query_embedding).astype('float32')
+def get_recommendations(query: str, model, index, metadata: Dict[int, Dict], 
+                       k: int = 10, max_duration: Union[int, None] = None,
+                       multi_vector: bool = False) -> "pd.DataFrame":
+    """Get recommendations based on query.
+    
+    With `multi_vector`, long text is split into token windows and each assessment
+    is ranked by its best-matching window instead of one pooled embedding."""
+    import pandas as pd
+
+    query_cache, result_cache, semantic_cache = get_caches()
+    cache_key = (normalize_query(query), k, max_duration, multi_vector)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return pd.DataFrame(cached)
     
-    distances, indices = index.search(query_embedding, k=k)
+    hit, audited = None, False
+    if multi_vector:
+        ids, _ = max_sim_search(model, index, query, k)
+    else:
+        query_embedding = cached_encode(model, [query], query_cache)
+        # Pasted job descriptions rarely repeat byte for byte, but a near-identical one can reuse results
+        if semantic_cache is not None:
+            hit = semantic_cache.get(query_embedding, [(k, max_duration)])[0]
+        # A sample of hits is searched anyway, to measure how often the reused results are wrong
+        audited = hit is not None and random.random() < SEMANTIC_CACHE_AUDIT_RATE
+        if hit is not None and not audited:
+            result_cache.put(cache_key, hit[0])
+            return pd.DataFrame(hit[0])
+        distances, indices = search_index(index, query_embedding, k)
+        ids = indices[0]
     
     results = []
-    for idx in indices[0]:
-        if idx < len(metadata):
+    for idx in ids:
+        if idx in metadata:
             result = metadata[idx]
             results.append({
                 'Assessment Name': result['name'],
@@ -52,6 +98,11 @@ def get_recommendations(query: str, model, index, metadata: List[Dict],
                 'Test Types': ', '.join(result['test_types'])
             })
     
+    result_cache.put(cache_key, results)
+    if audited:
+        semantic_cache.record_audit(hit[1], results == hit[0])
+    elif semantic_cache is not None and not multi_vector:
+        semantic_cache.put(query_embedding[0], (k, max_duration), results)
     return pd.DataFrame(results)
 
 # Main UI
@@ -81,7 +132,9 @@ try:
                                 min_value=15, max_value=120, value=60, step=15)
 
         if query:
-            results_df = get_recommendations(query, model, index, metadata)
+            # Job descriptions fetched from a URL are long, so match them passage by passage
+            results_df = get_recommendations(query, model, index, metadata,
+                                             multi_vector=input_type == "Job Description URL")
             
             st.subheader("Recommended Assessments")
             if not results_df.empty:
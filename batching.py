@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Groups requests that arrive close together and processes them as one batch.
+
+    `process_batch` receives a list of items and must return a list of results in
+    the same order. It runs on `executor`, so it may block. `observe_wait`, if
+    given, is called with each item's queue wait in seconds.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], executor: Executor,
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0, max_concurrent_batches: int = 1,
+                 observe_wait: Optional[Callable[[float], None]] = None):
+        self.process_batch = process_batch
+        self.observe_wait = observe_wait
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrent_batches = max_concurrent_batches
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker: Optional[asyncio.Task] = None
+        self.batch_slots: Optional[asyncio.Semaphore] = None
+        self.running_batches = set()
+
+        # Metrics
+        self.batch_sizes = Counter()
+        self.total_items = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue `item` for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.worker.done():
+            # Queue primitives are bound to the loop that first uses them
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self.worker = loop.create_task(self._collect())
+
+        future = loop.create_future()
+        await self.queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Pull items off the queue and dispatch them in batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self.batch_slots.acquire()
+            task = asyncio.create_task(self._run(batch))
+            self.running_batches.add(task)
+            task.add_done_callback(self.running_batches.discard)
+
+    async def _run(self, batch: List[tuple]):
+        """Process one batch on the executor and resolve its futures"""
+        try:
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                wait = started - enqueued
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+                if self.observe_wait is not None:
+                    self.observe_wait(wait)
+            self.batch_sizes[len(batch)] += 1
+            self.total_items += len(batch)
+
+            items = [item for item, _, _ in batch]
+            try:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.batch_slots.release()
+
+    def stats(self) -> Dict:
+        """Batch size distribution and queue wait statistics"""
+        total_batches = sum(self.batch_sizes.values())
+        return {
+            "batches": total_batches,
+            "items": self.total_items,
+            "mean_batch_size": self.total_items / total_batches if total_batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_wait_ms": 1000 * self.total_wait / self.total_items if self.total_items else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_wait_seen
+        }
+
+    def close(self):
+        """Stop collecting new batches"""
+        if self.worker is not None:
+            self.worker.cancel()
@@ -0,0 +1,93 @@
+"""Recall/latency benchmark of the ANN index backends against the exact flat index.
+
+    python -m benchmarks.ann --n 100000 --json bench/ann.json
+    python -m benchmarks.ann --embeddings models/index/embeddings.npy
+"""
+import argparse
+import time
+
+import numpy as np
+
+from indexes import make_index, search_parameters
+from benchmarks.common import latency_summary, print_table, recall_at_k, synthetic_embeddings, write_results
+
+def run_config(index, queries: np.ndarray, truth: np.ndarray, k: int, single_queries: int, **params) -> dict:
+    """Time single-query and batched search for one parameter setting"""
+    latencies = []
+    for q in queries[:single_queries]:
+        start = time.perf_counter()
+        index.search(q[None, :], k, params=search_parameters(index, **params))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    _, found = index.search(queries, k, params=search_parameters(index, **params))
+    elapsed = time.perf_counter() - start
+
+    return {
+        **latency_summary(latencies),
+        "qps": len(queries) / elapsed,
+        f"recall@{k}": recall_at_k(found, truth, k)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ANN index backends against the flat baseline")
+    parser.add_argument("--n", type=int, default=10000, help="Synthetic catalog size")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding dimension")
+    parser.add_argument("--embeddings", help="Benchmark a saved embedding matrix (.npy) instead of synthetic data")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries")
+    parser.add_argument("--single-queries", type=int, default=200, help="Queries timed one at a time for latency")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        data = np.ascontiguousarray(np.load(args.embeddings), dtype='float32')
+        rng = np.random.default_rng(0)
+        # Perturbed catalog vectors stand in for queries
+        queries = data[rng.integers(0, len(data), args.queries)]
+        queries = queries + 0.1 * rng.standard_normal(queries.shape).astype('float32')
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_embeddings(args.n + args.queries, args.dim)
+        data, queries = vectors[:args.n], vectors[args.n:]
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    ids = np.arange(len(data), dtype='int64')
+    dimension = data.shape[1]
+    k = min(args.k, len(data))
+
+    print(f"Catalog: {len(data)} x {dimension}, queries: {len(queries)}, k={k}")
+
+    configs = [("flat", {}, {})]
+    configs += [("hnsw", {}, {"ef_search": ef}) for ef in args.ef_search]
+    configs += [("ivf_flat", {}, {"nprobe": p}) for p in args.nprobe]
+    configs += [("ivf_pq", {}, {"nprobe": p}) for p in args.nprobe]
+
+    built = {}
+    truth = None
+    rows = []
+    for backend, build_params, search_params in configs:
+        if backend not in built:
+            start = time.perf_counter()
+            built[backend] = (make_index(dimension, data, ids, backend, **build_params), time.perf_counter() - start)
+        index, build_seconds = built[backend]
+
+        if truth is None:
+            _, truth = index.search(queries, k)
+
+        result = run_config(index, queries, truth, k, args.single_queries, **search_params)
+        rows.append({
+            "backend": backend,
+            "params": ",".join(f"{key}={value}" for key, value in search_params.items()),
+            "build_s": build_seconds,
+            **result
+        })
+
+    print_table(rows, ["backend", "params", "build_s", "p50_ms", "p99_ms", "qps", f"recall@{k}"])
+
+    if args.json:
+        write_results(args.json, {"n": len(data), "dimension": dimension, "k": k, "results": rows})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+import os
+import platform
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+def latency_summary(latencies: Sequence[float]) -> Dict:
+    """p50/p95/p99/mean of latencies given in seconds, reported in milliseconds"""
+    ms = np.asarray(latencies, dtype='float64') * 1000
+    if not len(ms):
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean())
+    }
+
+def synthetic_embeddings(n: int, dimension: int = 384, seed: int = 0) -> np.ndarray:
+    """Unit-norm random vectors with some cluster structure, like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 50), dimension)).astype('float32')
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dimension)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+# Words for synthetic catalog items and queries
+VOCABULARY = (
+    "java python sql javascript developer analyst manager sales customer service cognitive personality "
+    "numerical verbal reasoning leadership graduate entry level senior engineer data finance accounting "
+    "administrative clerical call centre retail banking insurance collaboration teamwork communication "
+    "problem solving attention detail situational judgement coding programming cloud network security "
+    "project agile support technician supervisor operations logistics healthcare nursing marketing"
+).split()
+TEST_TYPES = ["A", "B", "C", "D", "E", "K", "P", "S"]
+
+def synthetic_catalog(n: int, seed: int = 0) -> List[Dict]:
+    """Catalog records shaped like the scraped ones, with made-up text"""
+    rng = np.random.default_rng(seed)
+    words = np.array(VOCABULARY)
+    records = []
+    for i in range(n):
+        name = " ".join(words[rng.integers(0, len(words), 3)]).title()
+        records.append({
+            "name": f"{name} {i}",
+            "url": f"https://example.com/assessments/{i}/",
+            "remote_testing": bool(rng.random() < 0.8),
+            "adaptive": bool(rng.random() < 0.3),
+            "test_types": sorted(set(rng.choice(TEST_TYPES, rng.integers(1, 4)).tolist())),
+            "description": " ".join(words[rng.integers(0, len(words), 20)]),
+            "duration": int(rng.choice([10, 15, 20, 30, 40, 45, 60, 90]))
+        })
+    return records
+
+def synthetic_queries(n: int, words: int, seed: int = 0) -> List[str]:
+    """Queries of `words` words drawn from the catalog vocabulary"""
+    rng = np.random.default_rng(seed + words)
+    return [" ".join(rng.choice(VOCABULARY, words).tolist()) for _ in range(n)]
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    """Fraction of the true top-k neighbours present in the found top-k, averaged over queries"""
+    hits = sum(len(np.intersect1d(f[:k], t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+def write_results(path: str, results: Dict):
+    """Write benchmark results with enough context to compare runs"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    payload = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        **results
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path}")
+
+def print_table(rows: List[Dict], columns: List[str]):
+    """Print rows as an aligned text table"""
+    widths = {c: max([len(c)] + [len(_fmt(r.get(c))) for r in rows]) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return "" if value is None else str(value)
@@ -0,0 +1,82 @@
+"""Embedding drift and latency of the encoder backends against PyTorch fp32.
+
+    python -m benchmarks.encoders --backends torch onnx openvino openvino_int8 --json bench/encoders.json
+"""
+import argparse
+import time
+
+import numpy as np
+from tenacity import stop_after_attempt
+
+from encoders import BACKENDS
+from init_vectorstore import assessment_text, load_catalog, load_model
+from test_cases import test_queries
+from benchmarks.common import latency_summary, print_table, recall_at_k, write_results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare encoder backends against the PyTorch reference")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--reference", default="torch", choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=20, help="Timed single-query encodes per query")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=10, help="Depth for the catalog ranking overlap")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    catalog_texts = [assessment_text(a) for a in load_catalog()]
+    queries = [case["query"] for case in test_queries] + ["java developer", "analyst", "sales manager"]
+    k = min(args.k, len(catalog_texts))
+
+    backends = [args.reference] + [b for b in args.backends if b != args.reference]
+    reference = None
+    rows = []
+    for backend in backends:
+        try:
+            # A missing runtime will not appear on retry, so fail fast
+            model = load_model.retry_with(stop=stop_after_attempt(1), reraise=True)(backend)
+        except Exception as e:
+            print(f"Skipping {backend}: {str(e)}")
+            continue
+
+        model.encode(queries[:1])  # warm up
+
+        start = time.perf_counter()
+        catalog = np.asarray(model.encode(catalog_texts, batch_size=args.batch_size), dtype='float32')
+        batch_seconds = time.perf_counter() - start
+
+        latencies = []
+        for query in queries:
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                model.encode([query])
+                latencies.append(time.perf_counter() - start)
+        query_vectors = np.asarray(model.encode(queries), dtype='float32')
+
+        # Rank the catalog by cosine similarity (embeddings are unit-norm)
+        ranking = np.argsort(-query_vectors @ catalog.T, axis=1)[:, :k]
+        if reference is None:
+            reference = (catalog, query_vectors, ranking)
+        ref_catalog, ref_queries, ref_ranking = reference
+
+        cosine = np.sum(catalog * ref_catalog, axis=1) / (
+            np.linalg.norm(catalog, axis=1) * np.linalg.norm(ref_catalog, axis=1)
+        )
+        rows.append({
+            "backend": backend,
+            "mean_cosine": float(cosine.mean()),
+            "min_cosine": float(cosine.min()),
+            "max_abs_diff": float(np.abs(catalog - ref_catalog).max()),
+            "query_max_abs_diff": float(np.abs(query_vectors - ref_queries).max()),
+            f"ranking_overlap@{k}": recall_at_k(ranking, ref_ranking, k),
+            **latency_summary(latencies),
+            "batch_texts_per_s": len(catalog_texts) / batch_seconds
+        })
+
+    print_table(rows, ["backend", "mean_cosine", "min_cosine", "max_abs_diff", f"ranking_overlap@{k}",
+                       "p50_ms", "p99_ms", "batch_texts_per_s"])
+
+    if args.json:
+        write_results(args.json, {"reference": args.reference, "texts": len(catalog_texts), "results": rows})
+
+if __name__ == "__main__":
+    main()
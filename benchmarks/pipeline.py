@@ -0,0 +1,244 @@
+"""Per-stage latency of the recommendation pipeline, and load generation against the API.
+
+Stage mode times tokenize, encode, search, filter, format and serialize for
+each query on synthetic catalogs, across query lengths. Load mode drives the
+FastAPI app in-process through an ASGI client at several concurrency levels.
+
+    python -m benchmarks.pipeline --sizes 1000 10000 100000 --json bench/pipeline.json
+    python -m benchmarks.pipeline --mode load --concurrency 1 8 32 --requests 500
+    python -m benchmarks.pipeline --baseline bench/pipeline.json   # exits 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import numpy as np
+from tenacity import stop_after_attempt
+
+from chunking import encode_queries
+from encoders import BACKENDS, ENCODER_BACKEND
+from indexes import BACKENDS as INDEX_BACKENDS, INDEX_BACKEND, make_index
+from catalog import ColumnarCatalog
+from init_vectorstore import TEST_TYPE_NAMES, assessment_text, load_model
+from lexical import BM25Index
+from search import AttributeFilter, SearchRequest, filtered_search, hybrid_search
+from benchmarks.common import (latency_summary, print_table, synthetic_catalog, synthetic_embeddings,
+                               synthetic_queries, write_results)
+
+STAGES = ["tokenize", "encode", "search", "filter", "hybrid", "format", "serialize"]
+
+def build_catalog(n: int, dimension: int, backend: str):
+    """Synthetic catalog with its index, attribute filter and BM25 index.
+
+    Catalog vectors are random rather than encoded, since search cost depends
+    only on their number and dimension; queries still go through the real encoder.
+    """
+    records = synthetic_catalog(n)
+    ids = np.arange(n, dtype='int64')
+    embeddings = synthetic_embeddings(n, dimension)
+    index = make_index(dimension, embeddings, ids, backend)
+    catalog = ColumnarCatalog.from_records(records, ids, list(TEST_TYPE_NAMES))
+    lexical = BM25Index.build((assessment_text(r) for r in records), ids)
+    return index, embeddings, catalog, AttributeFilter(catalog), lexical
+
+def format_response(query: str, ids: np.ndarray, catalog: ColumnarCatalog) -> Dict:
+    """The /recommend response body for ranked IDs"""
+    recommendations = catalog.records(catalog.rows_for(ids))
+    return {"query": query, "recommendations": recommendations, "total_results": len(recommendations)}
+
+def time_stages(model, catalog, queries: List[str], k: int, max_duration: int) -> Dict[str, List[float]]:
+    """Seconds spent in each stage, per query, serving queries one at a time"""
+    index, embeddings, columns, attribute_filter, lexical = catalog
+    timings = defaultdict(list)
+    clock = time.perf_counter
+
+    for query in queries:
+        if hasattr(model, "tokenize"):
+            start = clock()
+            model.tokenize([query])
+            timings["tokenize"].append(clock() - start)
+
+        start = clock()
+        query_embeddings = encode_queries(model, [query])
+        timings["encode"].append(clock() - start)
+
+        start = clock()
+        filtered_search(index, attribute_filter, query_embeddings, [SearchRequest(query, k)])
+        timings["search"].append(clock() - start)
+
+        request = SearchRequest(query, k, max_duration)
+        start = clock()
+        filtered_search(index, attribute_filter, query_embeddings, [request])
+        timings["filter"].append(clock() - start)
+
+        start = clock()
+        ids = hybrid_search(index, attribute_filter, lexical, embeddings, query_embeddings,
+                            [request._replace(lexical_weight=1.0)])[0]
+        timings["hybrid"].append(clock() - start)
+
+        start = clock()
+        response = format_response(query, ids, columns)
+        timings["format"].append(clock() - start)
+
+        start = clock()
+        json.dumps(response)
+        timings["serialize"].append(clock() - start)
+
+    return timings
+
+def time_batched(model, catalog, queries: List[str], k: int) -> Dict[str, float]:
+    """Throughput of encoding and searching all queries as one batch"""
+    index, _, _, attribute_filter, _ = catalog
+    start = time.perf_counter()
+    query_embeddings = encode_queries(model, queries)
+    encode_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    filtered_search(index, attribute_filter, query_embeddings, [SearchRequest(q, k) for q in queries])
+    search_seconds = time.perf_counter() - start
+    return {"batch_encode_qps": len(queries) / encode_seconds, "batch_search_qps": len(queries) / search_seconds}
+
+def run_stages(args) -> List[Dict]:
+    model = load_model.retry_with(stop=stop_after_attempt(1), reraise=True)(args.backend)
+    dimension = model.get_sentence_embedding_dimension()
+    model.encode(["warm up"])
+
+    rows = []
+    for n in args.sizes:
+        start = time.perf_counter()
+        catalog = build_catalog(n, dimension, args.index_backend)
+        print(f"Built {args.index_backend} catalog of {n} in {time.perf_counter() - start:.1f}s")
+
+        for words in args.query_words:
+            queries = synthetic_queries(args.queries, words)
+            timings = time_stages(model, catalog, queries, args.k, args.max_duration)
+            batched = time_batched(model, catalog, queries, args.k)
+            total = np.sum([timings[stage] for stage in STAGES if stage in timings], axis=0)
+            for stage in STAGES + ["total"]:
+                latencies = total if stage == "total" else timings.get(stage)
+                if latencies is None or not len(latencies):
+                    continue
+                rows.append({"n": n, "query_words": words, "stage": stage, **latency_summary(latencies)})
+            rows[-1].update(batched)
+
+    print_table(rows, ["n", "query_words", "stage", "p50_ms", "p95_ms", "p99_ms", "mean_ms",
+                       "batch_encode_qps", "batch_search_qps"])
+    return rows
+
+async def generate_load(app, queries: List[str], concurrency: int, total: int, params: Dict,
+                        base_url: str = "http://bench") -> Dict:
+    """Send `total` /recommend requests from `concurrency` clients in a closed loop.
+
+    Requests go to `app` in-process, or over HTTP to `base_url` when `app` is None.
+    """
+    import httpx
+
+    latencies = []
+    statuses = Counter()
+    counter = iter(range(total))
+
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=None, limits=limits) as client:
+        async def worker():
+            for i in counter:
+                start = time.perf_counter()
+                response = await client.get("/recommend", params={"query": queries[i % len(queries)], **params})
+                latencies.append(time.perf_counter() - start)
+                statuses[response.status_code] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        **latency_summary(latencies),
+        "qps": total / elapsed,
+        "errors": sum(count for status, count in statuses.items() if status != 200),
+        "statuses": dict(statuses)
+    }
+
+def run_load(args) -> List[Dict]:
+    # The API builds its index and model on import, from the configured catalog
+    import api
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one log line per request otherwise
+    params = {"max_results": args.k, "max_duration": args.max_duration, "lexical_weight": args.lexical_weight}
+    rows = []
+    for words in args.query_words:
+        # Distinct queries, so the result cache doesn't answer most requests
+        queries = synthetic_queries(args.requests, words, seed=1)
+        asyncio.run(generate_load(api.app, queries[:args.concurrency[0]], args.concurrency[0],
+                                  args.concurrency[0], params))  # warm up
+        for concurrency in args.concurrency:
+            api.result_cache.clear()
+            result = asyncio.run(generate_load(api.app, queries, concurrency, args.requests, params))
+            rows.append({"query_words": words, "concurrency": concurrency, **result})
+
+    print_table(rows, ["query_words", "concurrency", "p50_ms", "p95_ms", "p99_ms", "qps", "errors"])
+    return rows
+
+def regressions(results: Dict, baseline_path: str, tolerance: float) -> List[str]:
+    """Rows whose p99 latency grew, or whose QPS fell, by more than `tolerance`"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    keys = {"stages": ("n", "query_words", "stage"), "load": ("query_words", "concurrency")}
+    found = []
+    for mode, key_fields in keys.items():
+        base_rows = {tuple(r[f] for f in key_fields): r for r in baseline.get(mode, [])}
+        for row in results.get(mode, []):
+            key = tuple(row[f] for f in key_fields)
+            base = base_rows.get(key)
+            if base is None:
+                continue
+            label = f"{mode} {dict(zip(key_fields, key))}"
+            if base.get("p99_ms") and row["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+                found.append(f"{label}: p99_ms {base['p99_ms']:.2f} -> {row['p99_ms']:.2f}")
+            if base.get("qps") and row.get("qps", 0) < base["qps"] * (1 - tolerance):
+                found.append(f"{label}: qps {base['qps']:.1f} -> {row['qps']:.1f}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages and API load")
+    parser.add_argument("--mode", choices=["stages", "load", "all"], default="stages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Synthetic catalog sizes")
+    parser.add_argument("--query-words", type=int, nargs="+", default=[4, 32, 384],
+                        help="Query lengths in words; the longest exceeds the encoder's token window")
+    parser.add_argument("--queries", type=int, default=100, help="Queries timed per size and length")
+    parser.add_argument("--backend", default=ENCODER_BACKEND, choices=BACKENDS, help="Encoder backend")
+    parser.add_argument("--index-backend", default=INDEX_BACKEND, choices=INDEX_BACKENDS)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-duration", type=int, default=40, help="Duration limit for the filter stage")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Load mode client counts")
+    parser.add_argument("--requests", type=int, default=500, help="Load mode requests per concurrency level")
+    parser.add_argument("--lexical-weight", type=float, default=1.0, help="Load mode lexical_weight parameter")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --json result")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed relative change before failing")
+    args = parser.parse_args()
+
+    results = {}
+    if args.mode in ("stages", "all"):
+        results["stages"] = run_stages(args)
+    if args.mode in ("load", "all"):
+        results["load"] = run_load(args)
+
+    if args.json:
+        write_results(args.json, {"encoder_backend": args.backend, "index_backend": args.index_backend,
+                                  "k": args.k, **results})
+
+    if args.baseline:
+        found = regressions(results, args.baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
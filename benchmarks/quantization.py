@@ -0,0 +1,110 @@
+"""Memory footprint, latency and recall loss of reduced-precision index storage.
+
+Compares float16 and int8 scalar-quantized flat indexes, and binary codes with
+and without float re-ranking, against the exact float32 flat index.
+
+    python -m benchmarks.quantization --n 100000 --json bench/quantization.json
+    python -m benchmarks.quantization --embeddings models/index/embeddings.npy --rerank-factors 4 10 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from catalog import ColumnarCatalog
+from indexes import index_bytes, make_index, search_index
+from init_vectorstore import TEST_TYPE_NAMES
+from search import AttributeFilter, SearchRequest, filtered_search
+from benchmarks.common import (latency_summary, print_table, recall_at_k, synthetic_catalog, synthetic_embeddings,
+                               write_results)
+
+def time_search(search, queries: np.ndarray, single_queries: int):
+    """Single-query latencies and batched QPS of `search(queries) -> ids`"""
+    latencies = []
+    for q in queries[:single_queries]:
+        start = time.perf_counter()
+        search(q[None, :])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    found = search(queries)
+    elapsed = time.perf_counter() - start
+    return found, {**latency_summary(latencies), "qps": len(queries) / elapsed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-precision index storage against float32")
+    parser.add_argument("--n", type=int, default=10000, help="Synthetic catalog size")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding dimension")
+    parser.add_argument("--embeddings", help="Benchmark a saved embedding matrix (.npy) instead of synthetic data")
+    parser.add_argument("--queries", type=int, default=1000, help="Number of queries")
+    parser.add_argument("--single-queries", type=int, default=200, help="Queries timed one at a time for latency")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[1, 4, 10, 20],
+                        help="Binary candidates per result to re-rank on the float embeddings")
+    parser.add_argument("--rerank-dtype", default="float32", choices=["float32", "float16"],
+                        help="Storage type of the re-ranking embeddings (EMBEDDINGS_DTYPE)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        data = np.ascontiguousarray(np.load(args.embeddings), dtype='float32')
+        rng = np.random.default_rng(0)
+        # Perturbed catalog vectors stand in for queries
+        queries = data[rng.integers(0, len(data), args.queries)]
+        queries = queries + 0.1 * rng.standard_normal(queries.shape).astype('float32')
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    else:
+        vectors = synthetic_embeddings(args.n + args.queries, args.dim)
+        data, queries = vectors[:args.n], vectors[args.n:]
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    ids = np.arange(len(data), dtype='int64')
+    dimension = data.shape[1]
+    k = min(args.k, len(data))
+    print(f"Catalog: {len(data)} x {dimension}, queries: {len(queries)}, k={k}")
+
+    # Binary re-ranking runs through the serving path, which looks rows up in the columnar catalog
+    attribute_filter = AttributeFilter(ColumnarCatalog.from_records(synthetic_catalog(len(data)), ids,
+                                                                    list(TEST_TYPE_NAMES)))
+    rerank_vectors = data.astype(args.rerank_dtype)
+    requests = [SearchRequest("", k)] * len(queries)
+
+    rows = []
+    truth = None
+    for backend in ("flat", "flat_fp16", "flat_sq8", "binary"):
+        start = time.perf_counter()
+        index = make_index(dimension, data, ids, backend)
+        build_seconds = time.perf_counter() - start
+        size = index_bytes(index)
+
+        configs = [("", lambda q: search_index(index, q, k)[1], 0)]
+        if backend == "binary":
+            configs += [(f"rerank_factor={factor}",
+                         lambda q, factor=factor: filtered_search(index, attribute_filter, q, requests[:len(q)],
+                                                                  rerank_vectors, rerank_factor=factor),
+                         rerank_vectors.nbytes) for factor in args.rerank_factors]
+
+        for params, search, rerank_bytes in configs:
+            found, timing = time_search(search, queries, args.single_queries)
+            found = np.array([np.pad(r, (0, k - len(r)), constant_values=-1) for r in found])
+            if truth is None:
+                truth = found
+            rows.append({
+                "backend": backend,
+                "params": params,
+                "build_s": build_seconds,
+                "index_mb": size / 2 ** 20,
+                "bytes_per_vector": size / len(data),
+                "rerank_mb": rerank_bytes / 2 ** 20,
+                **timing,
+                f"recall@{k}": recall_at_k(found, truth, k)
+            })
+
+    print_table(rows, ["backend", "params", "index_mb", "bytes_per_vector", "rerank_mb", "p50_ms", "p95_ms", "qps",
+                       f"recall@{k}"])
+
+    if args.json:
+        write_results(args.json, {"n": len(data), "dimension": dimension, "k": k,
+                                  "rerank_dtype": args.rerank_dtype, "results": rows})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Cold-start time and memory of importing the serving modules.
+
+Each run imports the target in a fresh interpreter and reports wall time, RSS,
+PSS (memory not shared with other processes) and which heavy libraries got loaded.
+
+    python -m benchmarks.startup --targets api --backends torch onnx --json bench/startup.json
+    python -m benchmarks.startup --baseline bench/startup.json   # exits 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import print_table, write_results
+
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "onnxruntime", "openvino", "pandas", "bs4", "requests"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+
+def read_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+print(json.dumps({{
+    "import_s": elapsed,
+    "rss_kb": read_kb("/proc/self/status", "VmRSS"),
+    "pss_kb": read_kb("/proc/self/smaps_rollup", "Pss"),
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules]
+}}))
+"""
+
+def probe(target: str, backend: str) -> dict:
+    """Import `target` in a fresh interpreter and return its measurements"""
+    env = {**os.environ, "ENCODER_BACKEND": backend}
+    code = PROBE.format(target=target, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def summarize(target: str, backend: str, runs: list) -> dict:
+    def median(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    rss, pss = median("rss_kb"), median("pss_kb")
+    return {
+        "target": target,
+        "backend": backend,
+        "import_s": median("import_s"),
+        "rss_mb": rss / 1024 if rss is not None else None,
+        "pss_mb": pss / 1024 if pss is not None else None,
+        "heavy_modules": ",".join(runs[-1]["heavy_modules"])
+    }
+
+def regressions(rows: list, baseline_path: str, tolerance: float) -> list:
+    """Rows whose import time or RSS grew more than `tolerance` over the baseline"""
+    with open(baseline_path) as f:
+        baseline = {(r["target"], r["backend"]): r for r in json.load(f)["results"]}
+
+    found = []
+    for row in rows:
+        base = baseline.get((row["target"], row["backend"]))
+        if base is None:
+            continue
+        for key in ("import_s", "rss_mb"):
+            if row[key] is not None and base.get(key) and row[key] > base[key] * (1 + tolerance):
+                found.append(f"{row['target']} ({row['backend']}): {key} {base[key]:.2f} -> {row[key]:.2f}")
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and memory of the serving path")
+    parser.add_argument("--targets", nargs="+", default=["api"], help="Modules to import")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"], help="ENCODER_BACKEND values to try")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --json result")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative growth before failing")
+    args = parser.parse_args()
+
+    rows = []
+    for target in args.targets:
+        for backend in args.backends:
+            try:
+                runs = [probe(target, backend) for _ in range(args.runs)]
+            except subprocess.CalledProcessError as e:
+                print(f"Skipping {target} ({backend}): {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+                continue
+            rows.append(summarize(target, backend, runs))
+
+    print_table(rows, ["target", "backend", "import_s", "rss_mb", "pss_mb", "heavy_modules"])
+
+    if args.json:
+        write_results(args.json, {"runs": args.runs, "results": rows})
+
+    if args.baseline:
+        found = regressions(rows, args.baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Per-worker memory and aggregate throughput of multi-process serving.
+
+Starts serve.py at each worker count, with and without the memory-mapped index,
+drives it over HTTP from a closed-loop client, and reports RSS and PSS (memory
+not shared with other processes) per worker alongside total QPS.
+
+    python -m benchmarks.workers --workers 1 2 4 8 --json bench/workers.json
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from serve import prepare_index
+from benchmarks.common import print_table, synthetic_queries, write_results
+from benchmarks.pipeline import generate_load
+
+def read_kb(path: str, field: str) -> int:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def worker_pids(parent: int) -> List[int]:
+    """uvicorn worker processes started (via multiprocessing spawn) under `parent`"""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+
+    found, frontier = [], [parent]
+    while frontier:
+        pid = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == pid:
+                frontier.append(child)
+                try:
+                    with open(f"/proc/{child}/cmdline", "rb") as f:
+                        if b"spawn_main" in f.read():
+                            found.append(child)
+                except OSError:
+                    continue
+    return found
+
+def wait_ready(url: str, timeout: float):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Server at {url} did not become ready in {timeout:.0f}s")
+
+def run_server(workers: int, mmap: bool, args) -> Dict:
+    """Start serve.py, load it, and measure its workers"""
+    url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "serve.py", "--skip-build", "--host", "127.0.0.1", "--port", str(args.port),
+               "--workers", str(workers)] + ([] if mmap else ["--no-mmap"])
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        wait_ready(url + "/", args.startup_timeout)
+        params = {"max_results": args.k, "max_duration": args.max_duration}
+        queries = synthetic_queries(args.requests + args.concurrency, args.query_words, seed=1)
+        # Warm every worker, with queries the measured run doesn't repeat
+        asyncio.run(generate_load(None, queries[:args.concurrency], args.concurrency, args.concurrency * 2,
+                                  params, base_url=url))
+        result = asyncio.run(generate_load(None, queries[args.concurrency:], args.concurrency, args.requests,
+                                           params, base_url=url))
+
+        # uvicorn serves a single worker in the launching process itself
+        pids = worker_pids(server.pid) or [server.pid]
+        rss = [read_kb(f"/proc/{pid}/status", "VmRSS") / 1024 for pid in pids]
+        pss = [read_kb(f"/proc/{pid}/smaps_rollup", "Pss") / 1024 for pid in pids]
+        return {
+            "workers": workers,
+            "mmap": mmap,
+            "processes": len(pids),
+            "rss_mb_per_worker": float(np.mean(rss)) if rss else 0.0,
+            "pss_mb_per_worker": float(np.mean(pss)) if pss else 0.0,
+            "pss_mb_total": float(np.sum(pss)),
+            **result
+        }
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-worker memory and QPS of multi-process serving")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to run")
+    parser.add_argument("--modes", choices=["mmap", "heap"], nargs="+", default=["mmap", "heap"],
+                        help="Memory-mapped index (INDEX_MMAP=1) or a heap copy per worker")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent HTTP clients")
+    parser.add_argument("--query-words", type=int, default=16)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-duration", type=int, default=60)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--catalog", help="Catalog JSON to index (default: data/catalog.json)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.catalog:
+        os.environ["CATALOG_PATH"] = args.catalog
+    prepare_index(args.catalog)
+
+    rows = []
+    for mode in args.modes:
+        for workers in args.workers:
+            rows.append(run_server(workers, mode == "mmap", args))
+            print(f"{mode} x{workers}: {rows[-1]['qps']:.1f} QPS, {rows[-1]['pss_mb_per_worker']:.1f} MB PSS per worker")
+
+    print_table(rows, ["workers", "mmap", "processes", "rss_mb_per_worker", "pss_mb_per_worker", "pss_mb_total",
+                       "p50_ms", "p99_ms", "qps", "errors"])
+
+    if args.json:
+        write_results(args.json, {"requests": args.requests, "concurrency": args.concurrency, "results": rows})
+
+if __name__ == "__main__":
+    main()
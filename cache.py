@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from chunking import encode_queries
+
+# Semantic cache, off unless enabled: a query within SEMANTIC_CACHE_THRESHOLD cosine similarity
+# of a recent one with the same filters gets its results. A sample of hits is checked against
+# a real search to count false hits.
+SEMANTIC_CACHE_ENABLED = os.environ.get("SEMANTIC_CACHE_ENABLED", "0") == "1"
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_AUDIT_RATE = float(os.environ.get("SEMANTIC_CACHE_AUDIT_RATE", "0.01"))
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a query used as a cache key"""
+    return ' '.join(text.lower().split())
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live and hit/miss counters"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class ResultCache(LRUCache):
+    """LRU cache of ranked results that empties itself when the index version changes"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, version: Optional[str] = None):
+        super().__init__(maxsize, ttl)
+        self.version = version
+
+    def set_version(self, version: str):
+        """Record the current index version, dropping results computed against an older one"""
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "version": self.version}
+
+class SemanticCache:
+    """LRU cache of ranked results looked up by query embedding similarity rather than exact text.
+
+    Recent query embeddings are kept L2-normalized in a small exact inner-product
+    FAISS index, so a lookup is one cosine nearest-neighbour search. Neighbours at
+    or above `threshold` are tried closest first, and the first one cached under
+    the same `key` (the request without its text: limits, filters, weights) is
+    reused. Entries belong to one index version and are dropped when it changes.
+
+    Callers can check a sample of hits against a real search with `record_audit`;
+    the false-hit rate and the similarities of false hits show whether the
+    threshold is too loose.
+    """
+
+    def __init__(self, maxsize: int = 1024, threshold: float = 0.95, neighbours: int = 8,
+                 ttl: Optional[float] = None, version: Optional[str] = None):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.neighbours = neighbours
+        self.ttl = ttl
+        self.version = version
+        self.index: Optional[faiss.Index] = None  # created on the first put, once the dimension is known
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # entry ID -> (key, value, expires)
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.hit_similarity = 0.0  # summed over hits
+
+        # False-hit diagnostics
+        self.audits = 0
+        self.false_hits = 0
+        self.false_hit_similarities = deque(maxlen=100)
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        vectors = np.array(embeddings, dtype='float32', ndmin=2)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def _remove(self, entry_ids: List[int]):
+        for entry_id in entry_ids:
+            self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array(entry_ids, dtype='int64'))
+
+    def get(self, embeddings: np.ndarray, keys: Sequence[Hashable]) -> List[Optional[Tuple[Any, float]]]:
+        """(value, cosine similarity) of the closest compatible entry for each query, or None"""
+        with self.lock:
+            if not self.entries:
+                self.misses += len(keys)
+                return [None] * len(keys)
+
+            similarities, ids = self.index.search(self._normalize(embeddings), min(self.neighbours, len(self.entries)))
+            now = time.monotonic()
+            expired = []
+            found = []
+            for key, row_similarities, row_ids in zip(keys, similarities.tolist(), ids.tolist()):
+                match = None
+                for similarity, entry_id in zip(row_similarities, row_ids):
+                    if similarity < self.threshold:
+                        break
+                    entry = self.entries.get(entry_id)
+                    if entry is None or entry[0] != key:
+                        continue
+                    if entry[2] is not None and entry[2] <= now:
+                        expired.append(entry_id)
+                        continue
+                    self.entries.move_to_end(entry_id)
+                    match = (entry[1], similarity)
+                    break
+
+                if match is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.hit_similarity += match[1]
+                found.append(match)
+
+            if expired:
+                self._remove(sorted(set(expired)))
+            return found
+
+    def put(self, embedding: np.ndarray, key: Hashable, value: Any, version: Optional[str] = None):
+        """Cache `value` for one query embedding; ignored if it was computed for another index version"""
+        vector = self._normalize(embedding)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self.next_id
+            self.next_id += 1
+            self.index.add_with_ids(vector, np.array([entry_id], dtype='int64'))
+            self.entries[entry_id] = (key, value, expires)
+
+            evicted = []
+            while len(self.entries) > self.maxsize:
+                evicted.append(self.entries.popitem(last=False)[0])
+            if evicted:
+                self._remove(evicted)
+                self.evictions += len(evicted)
+
+    def record_audit(self, similarity: float, correct: bool):
+        """Record whether a hit at `similarity` matched the result of a real search"""
+        with self.lock:
+            self.audits += 1
+            if not correct:
+                self.false_hits += 1
+                self.false_hit_similarities.append(similarity)
+
+    def set_version(self, version: str):
+        """Record the current index version, dropping results computed against an older one"""
+        with self.lock:
+            if version == self.version:
+                return
+            self.version = version
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.index is not None:
+                self.index.reset()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "mean_hit_similarity": self.hit_similarity / self.hits if self.hits else None,
+            "audits": self.audits,
+            "false_hits": self.false_hits,
+            "false_hit_rate": self.false_hits / self.audits if self.audits else None,
+            "max_false_hit_similarity": max(self.false_hit_similarities, default=None),
+            "version": self.version
+        }
+
+def cached_encode(model, queries: List[str], cache: LRUCache) -> np.ndarray:
+    """Encode `queries`, reusing cached embeddings and encoding only the misses in one batch.
+    Queries longer than the model's token limit are windowed instead of truncated."""
+    keys = [normalize_query(q) for q in queries]
+    embeddings: List[Optional[np.ndarray]] = [cache.get(key) for key in keys]
+
+    # Queries that normalize to the same key are only encoded once
+    missing = {}
+    for i, emb in enumerate(embeddings):
+        if emb is None:
+            missing.setdefault(keys[i], []).append(i)
+
+    if missing:
+        encoded = encode_queries(model, [queries[rows[0]] for rows in missing.values()])
+        for (key, rows), emb in zip(missing.items(), encoded):
+            cache.put(key, emb)
+            for i in rows:
+                embeddings[i] = emb
+
+    return np.vstack(embeddings).astype('float32', copy=False)
@@ -0,0 +1,219 @@
+import json
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"SHLCAT1\0"
+ALIGNMENT = 64
+
+class StringColumn:
+    """Interned UTF-8 strings: each distinct value is stored once in `data`.
+
+    Value `i` is `data[offsets[i]:offsets[i + 1]]`, and row `r` holds value
+    `codes[r]`, so repeated descriptions cost one int32 per row.
+    """
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray, data: np.ndarray):
+        # Plain ndarray views: indexing a np.memmap subclass is much slower
+        self.codes = np.asarray(codes)
+        self.offsets = np.asarray(offsets)
+        self.data = np.asarray(data)
+        self.buffer = memoryview(self.data)
+
+    @classmethod
+    def build(cls, values: Iterable[str]) -> "StringColumn":
+        interned: Dict[str, int] = {}
+        codes = [interned.setdefault(v, len(interned)) for v in values]
+        encoded = [v.encode("utf-8") for v in interned]
+        offsets = np.zeros(len(encoded) + 1, dtype='int64')
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.array(codes, dtype='int32'), offsets, np.frombuffer(b"".join(encoded), dtype='uint8'))
+
+    def __getitem__(self, row: int) -> str:
+        return self.take([row])[0]
+
+    def take(self, rows: Sequence[int]) -> List[str]:
+        """Values of several rows, with the offsets gathered in one vectorized step"""
+        codes = self.codes[rows]
+        starts, ends = self.offsets[codes].tolist(), self.offsets[codes + 1].tolist()
+        return [str(self.buffer[start:end], "utf-8") for start, end in zip(starts, ends)]
+
+    def arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {f"{prefix}.codes": self.codes, f"{prefix}.offsets": self.offsets, f"{prefix}.data": self.data}
+
+class ColumnarCatalog:
+    """Assessment attributes stored column-wise, one row per embedding-matrix row.
+
+    Durations and flags are NumPy arrays and test types a bitmask (bit `i` is
+    `type_codes[i]`), so attribute filters are vectorized masks. Names, URLs and
+    descriptions are interned string columns. `save` writes every column into
+    one aligned file that `load` memory-maps, so forked workers share its pages.
+    """
+
+    STRING_COLUMNS = ("name", "url", "description")
+
+    def __init__(self, ids: np.ndarray, durations: np.ndarray, remote_testing: np.ndarray, adaptive: np.ndarray,
+                 test_types: np.ndarray, type_codes: List[str], strings: Dict[str, StringColumn]):
+        self.ids = np.asarray(ids)
+        self.durations = np.asarray(durations)
+        self.remote_testing = np.asarray(remote_testing)
+        self.adaptive = np.asarray(adaptive)
+        self.test_types = np.asarray(test_types)
+        self.type_codes = list(type_codes)
+        self.type_lists: Dict[int, List[str]] = {}
+        self.type_bits = {code: np.uint64(1) << np.uint64(i) for i, code in enumerate(self.type_codes)}
+        self.names = strings["name"]
+        self.urls = strings["url"]
+        self.descriptions = strings["description"]
+
+        # Sorted view of ids for ID -> row lookups
+        self.id_order = np.argsort(self.ids, kind='stable')
+        self.sorted_ids = self.ids[self.id_order]
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], ids: Iterable[int], type_codes: Sequence[str] = ()) -> "ColumnarCatalog":
+        """Build from catalog dicts; test type codes not in `type_codes` get the next free bits"""
+        codes = list(type_codes)
+        for record in records:
+            for code in record['test_types']:
+                if code not in codes:
+                    codes.append(code)
+        if len(codes) > 64:
+            raise ValueError(f"{len(codes)} distinct test types do not fit a 64-bit mask")
+
+        bit_of = {code: 1 << i for i, code in enumerate(codes)}
+        return cls(
+            ids=np.fromiter(ids, dtype='int64', count=len(records)),
+            durations=np.array([r.get('duration', 0) for r in records], dtype='int32'),
+            remote_testing=np.array([bool(r['remote_testing']) for r in records], dtype=bool),
+            adaptive=np.array([bool(r['adaptive']) for r in records], dtype=bool),
+            test_types=np.array([sum(bit_of[c] for c in set(r['test_types'])) for r in records], dtype='uint64'),
+            type_codes=codes,
+            strings={
+                "name": StringColumn.build(r['name'] for r in records),
+                "url": StringColumn.build(r['url'] for r in records),
+                "description": StringColumn.build(r.get('description', '') for r in records)
+            }
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_for(self, ids: np.ndarray) -> np.ndarray:
+        """Rows of the given assessment IDs"""
+        return self.id_order[np.searchsorted(self.sorted_ids, ids)]
+
+    def types_of(self, mask: int) -> List[str]:
+        """Test type codes of a bitmask, decoded once per distinct mask"""
+        codes = self.type_lists.get(mask)
+        if codes is None:
+            codes = self.type_lists[mask] = [code for i, code in enumerate(self.type_codes) if mask >> i & 1]
+        return list(codes)
+
+    def records(self, rows: Sequence[int]) -> List[Dict]:
+        """Catalog dicts of several rows, gathering each column once"""
+        rows = np.asarray(rows, dtype='int64')
+        columns = zip(
+            self.names.take(rows),
+            self.urls.take(rows),
+            self.remote_testing[rows].tolist(),
+            self.adaptive[rows].tolist(),
+            self.test_types[rows].tolist(),
+            self.descriptions.take(rows),
+            self.durations[rows].tolist()
+        )
+        return [{
+            "name": name,
+            "url": url,
+            "remote_testing": remote,
+            "adaptive": adaptive,
+            "test_types": self.types_of(types),
+            "description": description,
+            "duration": duration
+        } for name, url, remote, adaptive, types, description, duration in columns]
+
+    def record(self, row: int) -> Dict:
+        """The catalog dict of one row"""
+        return self.records([row])[0]
+
+    def type_mask(self, codes: Iterable[str]) -> np.uint64:
+        """Bitmask of test type codes; codes absent from the catalog contribute nothing"""
+        mask = np.uint64(0)
+        for code in codes:
+            mask |= self.type_bits.get(code, np.uint64(0))
+        return mask
+
+    def mask(self, min_duration: Optional[int] = None, max_duration: Optional[int] = None,
+             remote_testing: Optional[bool] = None, adaptive: Optional[bool] = None,
+             test_types: Optional[Iterable[str]] = None, match_all_types: bool = False) -> np.ndarray:
+        """Boolean mask of the rows matching every given condition.
+
+        `test_types` matches rows with any of the codes, or all of them with `match_all_types`.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if min_duration is not None:
+            mask &= self.durations >= min_duration
+        if max_duration is not None:
+            mask &= self.durations <= max_duration
+        if remote_testing is not None:
+            mask &= self.remote_testing == remote_testing
+        if adaptive is not None:
+            mask &= self.adaptive == adaptive
+        if test_types:
+            wanted = self.type_mask(test_types)
+            overlap = self.test_types & wanted
+            mask &= (overlap == wanted) if match_all_types else (overlap != 0)
+        return mask
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        arrays = {
+            "ids": self.ids,
+            "durations": self.durations,
+            "remote_testing": self.remote_testing,
+            "adaptive": self.adaptive,
+            "test_types": self.test_types
+        }
+        for name, column in zip(self.STRING_COLUMNS, (self.names, self.urls, self.descriptions)):
+            arrays.update(column.arrays(name))
+        return arrays
+
+    def save(self, path: str):
+        """Write all columns into one file: magic, header length, JSON header, then aligned arrays"""
+        arrays = self.columns()
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header = json.dumps({"type_codes": self.type_codes, "arrays": layout}).encode("utf-8")
+        start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ColumnarCatalog":
+        buffer = np.memmap(path, dtype='uint8', mode='r') if mmap else np.fromfile(path, dtype='uint8')
+        if buffer[:len(MAGIC)].tobytes() != MAGIC:
+            raise ValueError(f"{path} is not a columnar catalog")
+        header_length = int(buffer[len(MAGIC):len(MAGIC) + 8].view('uint64')[0])
+        header_end = len(MAGIC) + 8 + header_length
+        header = json.loads(buffer[len(MAGIC) + 8:header_end].tobytes())
+        start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"], dtype='int64'))
+            begin = start + spec["offset"]
+            arrays[name] = buffer[begin:begin + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
+        strings = {name: StringColumn(arrays[f"{name}.codes"], arrays[f"{name}.offsets"], arrays[f"{name}.data"])
+                   for name in cls.STRING_COLUMNS}
+        return cls(arrays["ids"], arrays["durations"], arrays["remote_testing"], arrays["adaptive"],
+                   arrays["test_types"], header["type_codes"], strings)
@@ -0,0 +1,128 @@
+import re
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+import faiss
+import numpy as np
+
+from indexes import search_index
+
+WORD_PATTERN = re.compile(r"\S+")
+
+# Window settings: overlap in tokens between consecutive windows, and how many
+# words are tokenized together when measuring them
+WINDOW_OVERLAP = 32
+WORDS_PER_BATCH = 256
+
+def max_window_tokens(model) -> int:
+    """Tokens per window: the model's sequence limit minus [CLS] and [SEP]"""
+    return model.max_seq_length - 2
+
+def token_counter(model) -> Callable[[List[str]], List[int]]:
+    """Word-piece counts of each text for either encoder type, without special tokens"""
+    tokenizer = model.tokenizer
+    if hasattr(tokenizer, "encode_batch"):
+        # tokenizers.Tokenizer (exported backends), which pads, so count the attention mask
+        return lambda texts: [sum(e.attention_mask) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+    # transformers tokenizer (SentenceTransformer)
+    return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+def iter_words(pieces: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Words from a string or a stream of text pieces, never splitting inside a piece"""
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    for piece in pieces:
+        for match in WORD_PATTERN.finditer(piece):
+            yield match.group()
+
+def iter_windows(pieces: Union[str, Iterable[str]], count_tokens: Callable[[List[str]], List[int]],
+                 max_tokens: int, overlap: int = WINDOW_OVERLAP) -> Iterator[Tuple[str, int]]:
+    """Split text into overlapping windows of at most `max_tokens` word-pieces.
+
+    Yields (window_text, token_count). Only the current window and one batch of
+    words are held at a time, so memory does not grow with the input length.
+    """
+    window = deque()
+    total = 0
+    fresh = False  # whether the window holds words not yet emitted
+
+    words = iter_words(pieces)
+    while True:
+        batch = [w for _, w in zip(range(WORDS_PER_BATCH), words)]
+        if not batch:
+            break
+
+        for word, n in zip(batch, count_tokens(batch)):
+            n = min(n, max_tokens)
+            if total + n > max_tokens and window:
+                yield ' '.join(w for w, _ in window), total
+                fresh = False
+                # Carry the tail of this window over as the start of the next one
+                while window and (total > overlap or total + n > max_tokens):
+                    total -= window.popleft()[1]
+            window.append((word, n))
+            total += n
+            fresh = True
+
+    if fresh:
+        yield ' '.join(w for w, _ in window), total
+
+def iter_window_batches(model, pieces: Union[str, Iterable[str]], batch_size: int = 32) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Encode the windows of `pieces` in batches, yielding (embeddings, token_counts)"""
+    windows = iter_windows(pieces, token_counter(model), max_window_tokens(model))
+    while True:
+        batch = [w for _, w in zip(range(batch_size), windows)]
+        if not batch:
+            return
+        texts, counts = zip(*batch)
+        embeddings = np.asarray(model.encode(list(texts), batch_size=batch_size), dtype='float32')
+        yield embeddings, np.array(counts, dtype='float32')
+
+def encode_long(model, pieces: Union[str, Iterable[str]], batch_size: int = 32) -> np.ndarray:
+    """One embedding for arbitrarily long text: the token-weighted mean of its window embeddings, normalized"""
+    total = None
+    for embeddings, counts in iter_window_batches(model, pieces, batch_size):
+        weighted = (embeddings * counts[:, None]).sum(axis=0)
+        total = weighted if total is None else total + weighted
+
+    if total is None:
+        return np.asarray(model.encode([""]), dtype='float32')[0]
+    return (total / max(np.linalg.norm(total), 1e-12)).astype('float32')
+
+def encode_queries(model, queries: List[str], batch_size: int = 32) -> np.ndarray:
+    """Encode queries, windowing those that could exceed the model's token limit.
+
+    Every word-piece covers at least one character, so a query no longer than
+    the token limit in characters is encoded directly; longer ones go through
+    `encode_long` instead of being silently truncated.
+    """
+    limit = max_window_tokens(model)
+    embeddings = np.empty((len(queries), model.get_sentence_embedding_dimension()), dtype='float32')
+
+    short = [i for i, q in enumerate(queries) if len(q) <= limit]
+    if short:
+        embeddings[short] = np.asarray(model.encode([queries[i] for i in short], batch_size=batch_size), dtype='float32')
+    for i, q in enumerate(queries):
+        if len(q) > limit:
+            embeddings[i] = encode_long(model, q, batch_size)
+
+    return embeddings
+
+def max_sim_search(model, index: faiss.Index, pieces: Union[str, Iterable[str]], k: int,
+                   batch_size: int = 32, params=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Multi-vector search: rank assessments by their best match against any window.
+
+    Each batch of windows is searched as soon as it is encoded and only the best
+    distance per assessment is kept, so memory is bounded by the candidates found.
+    Returns (ids, distances), best first.
+    """
+    best: Dict[int, float] = {}
+    for embeddings, _ in iter_window_batches(model, pieces, batch_size):
+        distances, ids = search_index(index, embeddings, k, params=params)
+        for item_id, distance in zip(ids.ravel().tolist(), distances.ravel().tolist()):
+            if item_id >= 0 and distance < best.get(item_id, float('inf')):
+                best[item_id] = distance
+
+    ranked = sorted(best.items(), key=lambda item: item[1])[:k]
+    return (np.array([i for i, _ in ranked], dtype='int64'),
+            np.array([d for _, d in ranked], dtype='float32'))
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino", "openvino_int8")
+
+# Encoder settings, overridable from the environment
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "0"))  # 0 lets the runtime decide
+ONNX_FILE = os.environ.get("ENCODER_ONNX_FILE", os.path.join("onnx", "model.onnx"))
+OPENVINO_FILES = {
+    "openvino": os.path.join("openvino", "openvino_model.xml"),
+    "openvino_int8": os.path.join("openvino", "openvino_model_qint8_quantized.xml")
+}
+
+class ExportedEncoder(ABC):
+    """MiniLM sentence encoder over an exported (ONNX or OpenVINO) transformer.
+
+    Reproduces the SentenceTransformer pipeline: tokenize, run the transformer,
+    mean-pool the token embeddings over the attention mask and L2-normalize.
+    `encode` matches `SentenceTransformer.encode` for the arguments used here.
+    """
+
+    def __init__(self, model_dir: str):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "sentence_bert_config.json")) as f:
+            self.max_seq_length = json.load(f)["max_seq_length"]
+        with open(os.path.join(model_dir, "1_Pooling", "config.json")) as f:
+            self.dimension = json.load(f)["word_embedding_dimension"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def tokenize(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        encodings = self.tokenizer.encode_batch(texts)
+        return {
+            "input_ids": np.array([e.ids for e in encodings], dtype='int64'),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype='int64'),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype='int64')
+        }
+
+    @abstractmethod
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        """Token embeddings of shape (batch, tokens, dimension)"""
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Sorting by length keeps padding within each batch small
+        order = np.argsort([-len(s) for s in sentences], kind='stable')
+        embeddings = np.empty((len(sentences), self.dimension), dtype='float32')
+        for start in range(0, len(sentences), batch_size):
+            rows = order[start:start + batch_size]
+            features = self.tokenize([sentences[i] for i in rows])
+            tokens = self.run(features)
+            mask = features["attention_mask"][..., None].astype('float32')
+            pooled = (tokens * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[rows] = pooled
+
+        return embeddings[0] if single else embeddings
+
+class OnnxEncoder(ExportedEncoder):
+    """Encoder running the exported transformer on ONNX Runtime"""
+
+    def __init__(self, model_dir: str, model_file: str = ONNX_FILE):
+        super().__init__(model_dir)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx encoder backend requires `pip install onnxruntime`") from e
+
+        options = ort.SessionOptions()
+        if ENCODER_THREADS:
+            options.intra_op_num_threads = ENCODER_THREADS
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        inputs = {name: value for name, value in features.items() if name in self.input_names}
+        return self.session.run(None, inputs)[0]
+
+class OpenVINOEncoder(ExportedEncoder):
+    """Encoder running the exported transformer on the OpenVINO CPU plugin"""
+
+    def __init__(self, model_dir: str, model_file: str = OPENVINO_FILES["openvino"]):
+        super().__init__(model_dir)
+        try:
+            from openvino.runtime import Core
+        except ImportError as e:
+            raise ImportError("The openvino encoder backends require `pip install openvino`") from e
+
+        config = {"INFERENCE_NUM_THREADS": str(ENCODER_THREADS)} if ENCODER_THREADS else {}
+        self.model = Core().compile_model(os.path.join(model_dir, model_file), "CPU", config)
+        self.input_names = {name for i in self.model.inputs for name in i.get_names()}
+
+    def run(self, features: Dict[str, np.ndarray]) -> np.ndarray:
+        inputs = {name: value for name, value in features.items() if name in self.input_names}
+        return self.model(inputs)[self.model.output(0)]
+
+def load_encoder(model_dir: str, backend: str) -> ExportedEncoder:
+    """Load an exported encoder backend from a SentenceTransformer model directory"""
+    logger.info(f"Loading {backend} encoder from {model_dir}")
+    if backend == "onnx":
+        return OnnxEncoder(model_dir)
+    if backend in OPENVINO_FILES:
+        return OpenVINOEncoder(model_dir, OPENVINO_FILES[backend])
+    raise ValueError(f"Unknown encoder backend '{backend}', expected one of {', '.join(BACKENDS)}")
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
 import numpy as np
 
 def calculate_recall_at_k(relevant: List[str], recommended: List[str], k: int) -> float:
@@ -13,13 +13,167 @@ def calculate_map_at_k(relevant: List[str], recommended: List[str], k: int) -> f
     """Calculate MAP@K"""
     if not relevant or not recommended:
         return 0.0
-    
+
     score = 0.0
     num_hits = 0
-    
+    seen = set()
+
     for i, pred in enumerate(recommended[:k]):
-        if pred in relevant and pred not in recommended[:i]:
+        if pred in relevant and pred not in seen:
             num_hits += 1
             score += num_hits / (i + 1)
-            
-    return score / min(len(relevant), k)
\ No newline at end of file
+        seen.add(pred)
+
+    return score / min(len(relevant), k)
+
+def relevance_matrix(ranked: np.ndarray, relevant: Sequence[Collection[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Hit matrix of ranked IDs against each query's relevant IDs, and the relevant counts.
+
+    `ranked` is (queries, depth) with -1 for missing results. Repeats of an ID
+    within a row only count at their first position, as in `calculate_map_at_k`.
+    """
+    n, depth = ranked.shape
+    num_relevant = np.fromiter((len(set(r)) for r in relevant), dtype='int64', count=n)
+    if not n or not depth:
+        return np.zeros((n, depth), dtype=bool), num_relevant
+
+    # Pairs (query, id) are packed into one int64 key so membership is a single isin;
+    # negative IDs stand for labels outside the catalog and can never be hit
+    pairs = [(q, i) for q, r in enumerate(relevant) for i in set(r) if i >= 0]
+    rel = np.array(pairs, dtype='int64').reshape(-1, 2)
+    stride = int(max(ranked.max(initial=0), rel[:, 1].max(initial=0))) + 2
+    rel_keys = rel[:, 0] * stride + rel[:, 1] + 1
+    keys = np.arange(n, dtype='int64')[:, None] * stride + ranked.astype('int64') + 1
+
+    hits = np.isin(keys, rel_keys) & (ranked >= 0)
+
+    # A stable sort keeps equal keys in rank order, so every repeat after the first is flagged
+    flat = keys.ravel()
+    order = np.argsort(flat, kind='stable')
+    repeated = np.zeros(flat.shape, dtype=bool)
+    repeated[order[1:]] = flat[order[1:]] == flat[order[:-1]]
+    return hits & ~repeated.reshape(keys.shape), num_relevant
+
+def ranking_metrics(hits: np.ndarray, num_relevant: np.ndarray, ks: Iterable[int],
+                    per_query: bool = False) -> Dict[str, object]:
+    """Recall@k, MAP@k, NDCG@k and MRR@k for every k in `ks`, from one pass over the hit matrix.
+
+    Queries with no relevant items score 0, like the per-query functions. With
+    `per_query`, arrays of per-query scores are returned instead of means.
+    """
+    n, depth = hits.shape
+    hits_f = hits.astype('float64')
+    positions = np.arange(1, depth + 1, dtype='float64')
+    has_relevant = num_relevant > 0
+    safe_relevant = np.maximum(num_relevant, 1)
+
+    cum_hits = np.cumsum(hits_f, axis=1)
+    cum_precision = np.cumsum(hits_f * cum_hits / positions, axis=1)
+    discounts = 1.0 / np.log2(positions + 1)
+    cum_dcg = np.cumsum(hits_f * discounts, axis=1)
+    ideal_dcg = np.concatenate([[0.0], np.cumsum(discounts)])
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1), depth)
+
+    results: Dict[str, object] = {}
+    for k in sorted(set(ks)):
+        if k < 1 or k > depth:
+            raise ValueError(f"k={k} is outside the ranked depth 1..{depth}")
+        at_k = k - 1
+        cutoff = np.minimum(num_relevant, k)
+        scores = {
+            f"recall@{k}": np.where(has_relevant, cum_hits[:, at_k] / safe_relevant, 0.0),
+            f"map@{k}": np.where(has_relevant, cum_precision[:, at_k] / np.maximum(cutoff, 1), 0.0),
+            f"ndcg@{k}": np.where(has_relevant, cum_dcg[:, at_k] / ideal_dcg[np.maximum(cutoff, 1)], 0.0),
+            f"mrr@{k}": np.where(first_hit < k, 1.0 / (first_hit + 1), 0.0)
+        }
+        for name, values in scores.items():
+            results[name] = values if per_query else float(values.mean()) if n else 0.0
+    return results
+
+def labels_to_ids(relevant: Sequence[Collection[str]], metadata: Dict[int, Dict]) -> List[List[int]]:
+    """Map relevant assessment names or URLs to IDs.
+
+    Labels missing from the catalog get a negative placeholder ID, so they still
+    count as relevant items that were not retrieved.
+    """
+    lookup = {}
+    for item_id, assessment in metadata.items():
+        lookup.setdefault(assessment['name'], item_id)
+        lookup.setdefault(assessment['url'], item_id)
+    labelled = []
+    for labels in relevant:
+        missing = iter(range(-2, -len(labels) - 2, -1))
+        labelled.append([lookup[label] if label in lookup else next(missing) for label in labels])
+    return labelled
+
+def search_ids(model, index, queries: List[str], k: int, batch_size: int = 4096,
+               max_durations: Optional[Sequence[Optional[int]]] = None, attribute_filter=None) -> np.ndarray:
+    """Ranked IDs (queries, k) for a whole query set: encoded in large batches and searched as one matrix.
+
+    Pass `max_durations` with a `search.AttributeFilter` to apply per-query duration limits.
+    """
+    from chunking import encode_queries
+    from indexes import search_index
+    from search import SearchRequest, filtered_search
+
+    embeddings = np.concatenate([encode_queries(model, queries[start:start + batch_size])
+                                 for start in range(0, len(queries), batch_size)]) \
+        if queries else np.empty((0, model.get_sentence_embedding_dimension()), dtype='float32')
+
+    if max_durations is None or attribute_filter is None:
+        _, ranked = search_index(index, embeddings, k)
+        return ranked
+
+    ranked = np.full((len(queries), k), -1, dtype='int64')
+    requests = [SearchRequest(q, k, d) for q, d in zip(queries, max_durations)]
+    for row, ids in enumerate(filtered_search(index, attribute_filter, embeddings, requests)):
+        ranked[row, :len(ids)] = ids
+    return ranked
+
+def evaluate(model, index, metadata: Dict[int, Dict], cases: List[Dict], ks: Sequence[int] = (1, 3, 5, 10),
+             batch_size: int = 4096, per_query: bool = False) -> Dict[str, object]:
+    """Evaluate labelled cases ({"query", "relevant"}) with one batched search at the largest k"""
+    ranked = search_ids(model, index, [case["query"] for case in cases], max(ks), batch_size)
+    hits, num_relevant = relevance_matrix(ranked, labels_to_ids([case["relevant"] for case in cases], metadata))
+    return ranking_metrics(hits, num_relevant, ks, per_query=per_query)
+
+def load_cases(path: Optional[str]) -> List[Dict]:
+    """Labelled cases from a JSON list or JSON Lines file, or the built-in test queries"""
+    import json
+
+    if path is None:
+        from test_cases import test_queries
+        return test_queries
+    with open(path) as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+    from init_vectorstore import init_vectorstore
+
+    parser = argparse.ArgumentParser(description="Evaluate ranking quality over a labelled query set")
+    parser.add_argument("--cases", help="JSON or JSONL file of {\"query\", \"relevant\": [names or URLs]}")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10], help="Cutoffs to sweep")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Queries encoded per batch")
+    parser.add_argument("--json", help="Write the metrics to this JSON file")
+    args = parser.parse_args()
+
+    index, model, metadata = init_vectorstore()
+    cases = load_cases(args.cases)
+    ks = [min(k, index.ntotal) for k in args.k]
+
+    start = time.perf_counter()
+    metrics = evaluate(model, index, metadata, cases, ks, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    for k in sorted(set(ks)):
+        print("  ".join(f"{name}@{k}: {metrics[f'{name}@{k}']:.3f}" for name in ("recall", "map", "ndcg", "mrr")))
+    print(f"{len(cases)} queries in {elapsed:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"queries": len(cases), "seconds": elapsed, **metrics}, f, indent=2)
@@ -0,0 +1,229 @@
+import asyncio
+import codecs
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Fetch settings, overridable from the environment
+FETCH_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", os.path.join("data", "fetch_cache"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "10"))
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_MAX_CONNECTIONS = int(os.environ.get("FETCH_MAX_CONNECTIONS", "10"))
+FETCH_FRESH_SECONDS = float(os.environ.get("FETCH_FRESH_SECONDS", "600"))
+
+class FetchError(Exception):
+    """A page could not be fetched and there was no cached copy to fall back on"""
+
+class ParagraphExtractor(HTMLParser):
+    """Incremental HTML parser collecting the text of <p> elements.
+
+    Fed chunk by chunk while the body downloads, so the whole document is never
+    held in memory. Produces the same text as joining BeautifulSoup's `p.text`.
+    """
+
+    SKIPPED = {"script", "style", "noscript", "template"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs: List[str] = []
+        self.current: List[str] = []
+        self.depth = 0
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self.skipping += 1
+        elif tag == "p":
+            self.depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag == "p" and self.depth:
+            self.depth -= 1
+            if not self.depth:
+                self.paragraphs.append("".join(self.current))
+                self.current = []
+
+    def handle_data(self, data):
+        if self.depth and not self.skipping:
+            self.current.append(data)
+
+    def text(self) -> str:
+        self.close()
+        if self.current:
+            self.paragraphs.append("".join(self.current))
+            self.current = []
+        return " ".join(self.paragraphs)
+
+class PageFetcher:
+    """Async job-description fetcher with a pooled client, size caps and an on-disk cache.
+
+    Cached pages are served without a request for `fresh_for` seconds. After that
+    they are revalidated with If-None-Match / If-Modified-Since, and a 304 reuses
+    the cached text. The cached copy is also served while the server can't be
+    reached or answers 5xx or 429; any other 4xx drops it. Pass an httpx
+    `transport` (e.g. `httpx.MockTransport`) to run against a local stand-in
+    instead of the network.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = FETCH_CACHE_DIR, timeout: float = FETCH_TIMEOUT,
+                 max_bytes: int = FETCH_MAX_BYTES, max_connections: int = FETCH_MAX_CONNECTIONS,
+                 fresh_for: float = FETCH_FRESH_SECONDS, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.concurrency = asyncio.Semaphore(max_connections)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,
+            headers={"User-Agent": "shl-recommendation/1.0"},
+            transport=transport
+        )
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_cache(self, url: str) -> Optional[Dict]:
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(url)) as f:
+                entry = json.load(f)
+            return entry if entry.get("url") == url else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, entry: Dict):
+        if not self.cache_dir:
+            return
+        # A unique temp file per write, so concurrent fetches of one URL don't clobber each other
+        tmp = tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False)
+        try:
+            with tmp:
+                json.dump(entry, tmp)
+            os.replace(tmp.name, self._cache_path(entry["url"]))
+        finally:
+            if os.path.exists(tmp.name):
+                os.unlink(tmp.name)
+
+    def _drop_cache(self, url: str):
+        if not self.cache_dir:
+            return
+        try:
+            os.unlink(self._cache_path(url))
+        except FileNotFoundError:
+            pass
+
+    async def fetch(self, url: str) -> str:
+        """Text of the page's paragraphs, from cache when it is fresh or still valid"""
+        cached = self._read_cache(url)
+        if cached is not None and time.time() - cached["fetched_at"] < self.fresh_for:
+            return cached["text"]
+
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            async with self.concurrency:
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304 and cached is not None:
+                        cached["fetched_at"] = time.time()
+                        self._write_cache(cached)
+                        return cached["text"]
+                    response.raise_for_status()
+                    text = await self._extract(response)
+        except httpx.HTTPError as e:
+            # Transport errors, 5xx and 429 are transient; any other 4xx means the page is gone or refused
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            if cached is not None:
+                if status is None or status >= 500 or status == 429:
+                    logger.warning(f"Serving stale copy of {url}: {str(e)}")
+                    return cached["text"]
+                self._drop_cache(url)
+            raise FetchError(f"Could not fetch {url}: {str(e)}") from e
+
+        self._write_cache({
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "text": text
+        })
+        return text
+
+    async def _extract(self, response: httpx.Response) -> str:
+        """Parse the body as it streams in, stopping at `max_bytes`"""
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        parser = ParagraphExtractor()
+        received = 0
+        async for chunk in response.aiter_bytes():
+            chunk = chunk[:self.max_bytes - received]
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if received >= self.max_bytes:
+                logger.warning(f"{response.url} exceeds {self.max_bytes} bytes, truncating")
+                break
+        parser.feed(decoder.decode(b"", final=True))
+        return parser.text()
+
+    async def fetch_many(self, urls: List[str]) -> List[str]:
+        """Fetch several pages concurrently; pages that fail come back as empty strings"""
+        results = await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
+        texts = []
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to fetch {url}: {str(result)}")
+                texts.append("")
+            else:
+                texts.append(result)
+        return texts
+
+    async def aclose(self):
+        await self.client.aclose()
+
+class BackgroundFetcher:
+    """Synchronous front for PageFetcher, for callers without an event loop (Streamlit).
+
+    The fetcher lives on its own event loop thread, so its connection pool is
+    reused across calls instead of being rebuilt on every rerun.
+    """
+
+    def __init__(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="page-fetcher", daemon=True)
+        self.thread.start()
+        self.fetcher = self._run(self._create(kwargs))
+
+    async def _create(self, kwargs) -> PageFetcher:
+        return PageFetcher(**kwargs)
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def fetch(self, url: str) -> str:
+        return self._run(self.fetcher.fetch(url))
+
+    def fetch_many(self, urls: List[str]) -> List[str]:
+        return self._run(self.fetcher.fetch_many(urls))
+
+    def close(self):
+        self._run(self.fetcher.aclose())
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,25 @@
+# gunicorn.conf.py
+#
+# gunicorn -c gunicorn.conf.py api:app
+#
+# The master imports api.py once (loading the model and index), then forks the
+# workers, which share those pages copy-on-write. Build the index beforehand with
+# `python init_vectorstore.py` so the master only loads it and never runs
+# multithreaded encoding before forking. The index is memory-mapped, so its
+# pages stay shared even as workers touch them (see serve.py for uvicorn).
+
+import gc
+import os
+
+os.environ.setdefault("INDEX_MMAP", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+def pre_fork(server, worker):
+    # Objects loaded so far are moved out of the collector's view, so garbage
+    # collection in the workers doesn't write to (and un-share) their pages
+    gc.freeze()
@@ -0,0 +1,178 @@
+import logging
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("flat", "hnsw", "ivf_flat", "ivf_pq", "flat_fp16", "flat_sq8", "binary")
+
+# Index settings, overridable from the environment
+INDEX_BACKEND = os.environ.get("INDEX_BACKEND", "flat")
+INDEX_PARAMS = {
+    "hnsw_m": int(os.environ.get("INDEX_HNSW_M", "32")),
+    "ef_construction": int(os.environ.get("INDEX_EF_CONSTRUCTION", "40")),
+    "nlist": int(os.environ.get("INDEX_NLIST", "0")),  # 0 picks ~sqrt(n)
+    "pq_m": int(os.environ.get("INDEX_PQ_M", "16")),
+    "pq_nbits": int(os.environ.get("INDEX_PQ_NBITS", "8"))
+}
+SEARCH_PARAMS = {
+    "ef_search": int(os.environ.get("INDEX_EF_SEARCH", "64")),
+    "nprobe": int(os.environ.get("INDEX_NPROBE", "8")),
+    "rerank_factor": int(os.environ.get("INDEX_RERANK_FACTOR", "10")),  # binary candidates per result
+    # HNSW/IVF filters passing at most this fraction of the index are ranked exactly instead
+    "exact_filter_fraction": float(os.environ.get("INDEX_EXACT_FILTER_FRACTION", "0.05"))
+}
+
+# Scalar quantizer of each reduced-precision flat backend
+SCALAR_QUANTIZERS = {
+    "flat_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "flat_sq8": faiss.ScalarQuantizer.QT_8bit
+}
+
+def make_index(dimension: int, embeddings: np.ndarray, ids: np.ndarray,
+               backend: str = INDEX_BACKEND, **params) -> faiss.Index:
+    """Build an ID-mapped index of the given backend over `embeddings`.
+
+    Trained backends are trained on `embeddings`, and their parameters are clamped
+    so that small catalogs still have enough training points. `flat_fp16` and
+    `flat_sq8` store each component in 2 bytes or 1 byte instead of 4; `binary`
+    stores one sign bit per component and is searched by Hamming distance, with
+    candidates re-ranked on the float embeddings (see `search.filtered_search`).
+    """
+    params = {**INDEX_PARAMS, **params}
+    n = len(embeddings)
+
+    if backend == "binary":
+        if dimension % 8:
+            raise ValueError(f"Binary codes need a dimension divisible by 8, got {dimension}")
+        index = faiss.IndexBinaryIDMap2(faiss.IndexBinaryFlat(dimension))
+        if n:
+            add_vectors(index, embeddings, ids)
+        logger.info(f"Built {backend} index over {n} vectors")
+        return index
+
+    if backend == "flat":
+        base = faiss.IndexFlatL2(dimension)
+    elif backend == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        base.hnsw.efConstruction = params["ef_construction"]
+    elif backend in SCALAR_QUANTIZERS:
+        base = faiss.IndexScalarQuantizer(dimension, SCALAR_QUANTIZERS[backend], faiss.METRIC_L2)
+    elif backend in ("ivf_flat", "ivf_pq"):
+        nlist = params["nlist"] or int(4 * math.sqrt(max(n, 1)))
+        # k-means wants ~39 points per centroid
+        nlist = max(1, min(nlist, n // 39))
+        quantizer = faiss.IndexFlatL2(dimension)
+        if backend == "ivf_flat":
+            base = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            pq_m = params["pq_m"]
+            if dimension % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dimension}")
+            pq_nbits = max(1, min(params["pq_nbits"], int(math.log2(max(n, 2)))))
+            base = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+    else:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    index = faiss.IndexIDMap2(base)
+    if n:
+        if not index.is_trained:
+            index.train(np.ascontiguousarray(embeddings, dtype='float32'))
+        add_vectors(index, embeddings, ids)
+
+    logger.info(f"Built {backend} index over {n} vectors")
+    return index
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Sign bit of every component, packed 8 per byte"""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+def is_binary(index) -> bool:
+    return isinstance(index, faiss.IndexBinary)
+
+def add_vectors(index, vectors: np.ndarray, ids: np.ndarray):
+    """Add float vectors to an ID-mapped index, binarizing them for binary backends"""
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    index.add_with_ids(binarize(vectors) if is_binary(index) else vectors, np.asarray(ids, dtype='int64'))
+
+def search_index(index, queries: np.ndarray, k: int, params=None) -> Tuple[np.ndarray, np.ndarray]:
+    """Search float queries on any backend, returning (distances, ids).
+
+    Binary indexes are searched with the queries' sign codes and take no
+    parameters; their distances are Hamming distances.
+    """
+    if is_binary(index):
+        distances, ids = index.search(binarize(queries), k)
+        return distances.astype('float32'), ids
+    return index.search(np.ascontiguousarray(queries, dtype='float32'), k, params=params)
+
+def write_index(index, path: str):
+    if is_binary(index):
+        faiss.write_index_binary(index, path)
+    else:
+        faiss.write_index(index, path)
+
+def read_index(path: str, mmap: bool = False):
+    """Read a float or binary index; binary index files start with an "IB" tag.
+
+    With `mmap`, the stored vectors and codes are mapped read-only from the file
+    instead of copied onto the heap, so every process loading the same file
+    shares one copy in the page cache. Such an index cannot be modified.
+    """
+    with open(path, 'rb') as f:
+        binary = f.read(2) == b"IB"
+    flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    return faiss.read_index_binary(path, flags) if binary else faiss.read_index(path, flags)
+
+def index_bytes(index) -> int:
+    """Serialized size of an index, a close proxy for its resident memory"""
+    if is_binary(index):
+        return faiss.serialize_index_binary(index).nbytes
+    return faiss.serialize_index(index).nbytes
+
+def index_backend(index) -> str:
+    """Backend name of an (ID-mapped) index"""
+    if is_binary(index):
+        return "binary"
+    base = faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexScalarQuantizer):
+        qtype = base.sq.qtype
+        return next((name for name, q in SCALAR_QUANTIZERS.items() if q == qtype), "flat")
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def is_approximate(index) -> bool:
+    """Whether a filtered search can miss eligible IDs (graph and inverted-list backends)"""
+    return index_backend(index) in ("hnsw", "ivf_flat", "ivf_pq")
+
+def supports_remove(index: faiss.Index) -> bool:
+    """Whether vectors can be removed in place (HNSW graphs cannot)"""
+    return index_backend(index) != "hnsw"
+
+def search_parameters(index: faiss.Index, selector: Optional[faiss.IDSelector] = None,
+                      **params) -> Optional[faiss.SearchParameters]:
+    """Per-call search parameters for `index`, or None if the defaults apply.
+
+    A fresh object is returned on every call: `IndexIDMap` rewrites the selector
+    on the parameters while searching, so they must not be shared across threads.
+    """
+    params = {**SEARCH_PARAMS, **params}
+    backend = index_backend(index)
+    if backend == "binary":
+        return None  # faiss binary indexes take no search parameters
+    kwargs: Dict = {} if selector is None else {"sel": selector}
+
+    if backend == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=params["ef_search"], **kwargs)
+    if backend in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(nprobe=params["nprobe"], **kwargs)
+    return faiss.SearchParameters(**kwargs) if kwargs else None
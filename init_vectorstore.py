@@ -1,10 +1,17 @@
-from sentence_transformers import SentenceTransformer
 import faiss
+import hashlib
 import json
 import numpy as np
 import os
 import logging
+import uuid
+from typing import Dict, List, Optional, Tuple
 from tenacity import retry, wait_exponential, stop_after_attempt
+from indexes import INDEX_BACKEND, add_vectors, make_index, read_index, supports_remove, write_index
+from encoders import ENCODER_BACKEND, load_encoder
+from lexical import BM25Index
+from catalog import ColumnarCatalog
+from metrics import STARTUP_SECONDS, span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -59,48 +66,349 @@ assessments = [
     }
 ]
 
+# SHL catalog test type codes
+TEST_TYPE_NAMES = {
+    "A": "Ability & Aptitude",
+    "B": "Biodata & Situational Judgement",
+    "C": "Competencies",
+    "D": "Development & 360",
+    "E": "Assessment Exercises",
+    "K": "Knowledge & Skills",
+    "P": "Personality & Behavior",
+    "S": "Simulations"
+}
+
+# Catalog written by scraper/scrape_catalog.py
+CATALOG_PATH = os.environ.get("CATALOG_PATH", os.path.join('data', 'catalog.json'))
+
 # Model settings
 MODEL_NAME = 'all-MiniLM-L6-v2'
 MODEL_CACHE = os.path.join('models', 'cache')
+MODEL_PATH = os.path.join(MODEL_CACHE, f"sentence-transformers_{MODEL_NAME}")
+
+# Persisted index settings
+INDEX_DIR = os.path.join('models', 'index')
+INDEX_FILE = 'index.faiss'
+EMBEDDINGS_FILE = 'embeddings.npy'
+METADATA_FILE = 'metadata.json'
+LEXICAL_FILE = 'lexical.npz'
+CATALOG_FILE = 'catalog.bin'
+
+# Map the persisted index read-only instead of loading it onto the heap, so worker
+# processes share it (see serve.py). A mapped index is never updated in place.
+INDEX_MMAP = os.environ.get("INDEX_MMAP", "0") == "1"
+
+# Storage type of embeddings.npy, used for fusion and binary re-ranking: float32 or float16
+EMBEDDINGS_DTYPE = os.environ.get("EMBEDDINGS_DTYPE", "float32")
 
 @retry(
     wait=wait_exponential(multiplier=1, min=4, max=60),
     stop=stop_after_attempt(3)
 )
-def load_model():
-    """Load or download the model"""
+def load_model(backend: str = ENCODER_BACKEND):
+    """Load or download the model on the given encoder backend"""
     try:
-        logger.info(f"Loading/downloading model: {MODEL_NAME}")
-        model = SentenceTransformer(MODEL_NAME, cache_folder=MODEL_CACHE)
+        logger.info(f"Loading/downloading model: {MODEL_NAME} ({backend})")
+        if backend == "torch":
+            # Imported here so the exported backends can serve without torch installed
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(MODEL_NAME, cache_folder=MODEL_CACHE)
+        else:
+            # Exported backends run the ONNX/OpenVINO files bundled with the cached model
+            model = load_encoder(MODEL_PATH, backend)
         return model
     except Exception as e:
         logger.error(f"Error with model: {str(e)}")
         raise
 
-def init_vectorstore():
+def load_catalog(path: str = CATALOG_PATH) -> List[Dict]:
+    """Load the scraped catalog, falling back to the sample assessments"""
+    if os.path.exists(path):
+        with open(path) as f:
+            records = json.load(f)
+        logger.info(f"Loaded {len(records)} assessments from {path}")
+    else:
+        logger.warning(f"{path} not found, using sample assessments")
+        records = assessments
+
+    # Scraped entries have no description or duration
+    normalized = [{"description": "", "duration": 0, **a} for a in records]
+    return dedupe_assessments(normalized)
+
+def assessment_text(assessment: Dict) -> str:
+    """Text that gets embedded for an assessment"""
+    test_types = ' '.join(TEST_TYPE_NAMES.get(t, t) for t in assessment['test_types'])
+    return f"{assessment['name']} {assessment['description']} {test_types}"
+
+def dedupe_assessments(records: List[Dict]) -> List[Dict]:
+    """Collapse assessments that share a name or URL, keeping the first occurrence"""
+    seen_names = set()
+    seen_urls = set()
+    unique = []
+    for assessment in records:
+        if assessment['name'] not in seen_names and assessment['url'] not in seen_urls:
+            seen_names.add(assessment['name'])
+            seen_urls.add(assessment['url'])
+            unique.append(assessment)
+    return unique
+
+def catalog_hash(records, model_name: str = MODEL_NAME) -> str:
+    """Content hash of the catalog and the model used to embed it"""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode('utf-8'))
+    digest.update(json.dumps(records, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+def text_hash(assessment: Dict) -> str:
+    """Hash of the embedded text, used to tell whether an item needs re-encoding"""
+    return hashlib.sha256(assessment_text(assessment).encode('utf-8')).hexdigest()
+
+def _atomic_write(path: str, write):
+    """Write to a temp file next to `path` and rename it into place"""
+    # The temp name is unique, so processes building the same artifact at once don't clobber each other
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def _read_sidecar(index_dir: str) -> Optional[Dict]:
+    """Read the metadata sidecar if every artifact is present"""
+    paths = [os.path.join(index_dir, name) for name in (METADATA_FILE, INDEX_FILE, EMBEDDINGS_FILE, LEXICAL_FILE)]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+
+    try:
+        with open(paths[0]) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable index metadata: {str(e)}")
+        return None
+
+def _load_artifacts(index_dir: str, sidecar: Dict, mmap: bool = False) -> Optional[Tuple[faiss.Index, np.ndarray]]:
+    """Load the index and memory-mapped embeddings described by `sidecar`"""
+    index = read_index(os.path.join(index_dir, INDEX_FILE), mmap=mmap)
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+    if index.ntotal != sidecar["count"] or embeddings.shape[0] != sidecar["count"]:
+        logger.warning("Persisted index is inconsistent with its metadata")
+        return None
+    return index, embeddings
+
+def _write_artifacts(index_dir: str, index: faiss.Index, embeddings: np.ndarray, lexical: BM25Index,
+                     catalog: ColumnarCatalog, sidecar: Dict):
+    """Persist the indexes, embeddings, columnar catalog and sidecar, sidecar last"""
+    os.makedirs(index_dir, exist_ok=True)
+
+    def write_embeddings(path):
+        with open(path, 'wb') as f:
+            np.save(f, embeddings.astype(EMBEDDINGS_DTYPE, copy=False))
+
+    def write_sidecar(path):
+        with open(path, 'w') as f:
+            json.dump(sidecar, f, indent=2)
+
+    # The sidecar is written last so an interrupted build never looks valid
+    _atomic_write(os.path.join(index_dir, EMBEDDINGS_FILE), write_embeddings)
+    _atomic_write(os.path.join(index_dir, INDEX_FILE), lambda p: write_index(index, p))
+    _atomic_write(os.path.join(index_dir, LEXICAL_FILE), lexical.save)
+    _atomic_write(os.path.join(index_dir, CATALOG_FILE), catalog.save)
+    _atomic_write(os.path.join(index_dir, METADATA_FILE), write_sidecar)
+
+def build_vectorstore(model, records: List[Dict], index_dir: str = INDEX_DIR, incremental: bool = True,
+                      backend: str = INDEX_BACKEND) -> Tuple[faiss.Index, np.ndarray, Dict[int, Dict]]:
+    """Bring the persisted index in line with `records`.
+
+    Items are matched to the previous build by URL and keep their IDs. Only
+    added items and items whose embedded text changed are encoded; removed and
+    changed items are dropped from the index with `remove_ids`. If the backend
+    changed or cannot remove vectors, the index is rebuilt from the embeddings.
+    Stored float16 embeddings are re-encoded when `EMBEDDINGS_DTYPE` is float32.
+    """
+    dimension = model.get_sentence_embedding_dimension()
+    index = None
+    old_embeddings = None
+    previous = {}
+    next_id = 0
+    reencode = False
+
+    sidecar = _read_sidecar(index_dir) if incremental else None
+    if sidecar is not None and sidecar.get("model_name") == MODEL_NAME \
+            and sidecar.get("dimension") == dimension and "ids" in sidecar:
+        loaded = _load_artifacts(index_dir, sidecar)
+        if loaded is not None:
+            index, old_embeddings = loaded
+            if sidecar.get("index_backend", "flat") != backend or not supports_remove(index):
+                index = None
+            # Widening stored embeddings (float16 -> float32) needs them re-encoded at full precision
+            if np.dtype(EMBEDDINGS_DTYPE).itemsize > old_embeddings.dtype.itemsize:
+                logger.info(f"Re-encoding {old_embeddings.dtype} embeddings as {EMBEDDINGS_DTYPE}")
+                index = None
+                reencode = True
+            next_id = sidecar["next_id"]
+            for row, (item_id, old, old_hash) in enumerate(zip(sidecar["ids"], sidecar["records"], sidecar["text_hashes"])):
+                previous[old['url']] = (item_id, row, old_hash)
+
+    text_hashes = [text_hash(a) for a in records]
+    ids = np.empty(len(records), dtype='int64')
+    embeddings = np.empty((len(records), dimension), dtype='float32')
+    to_encode = []
+    stale_ids = []
+    added = changed = 0
+
+    for row, (assessment, digest) in enumerate(zip(records, text_hashes)):
+        match = previous.pop(assessment['url'], None)
+        if match is None:
+            ids[row] = next_id
+            next_id += 1
+            added += 1
+            to_encode.append(row)
+        else:
+            item_id, old_row, old_hash = match
+            ids[row] = item_id
+            if old_hash == digest and not reencode:
+                embeddings[row] = old_embeddings[old_row]
+            else:
+                changed += old_hash != digest
+                stale_ids.append(item_id)
+                to_encode.append(row)
+
+    removed_ids = [item_id for item_id, _, _ in previous.values()]
+    stale_ids.extend(removed_ids)
+    logger.info(f"Catalog diff: {added} added, {changed} changed, {len(removed_ids)} removed")
+
+    # Release the old memory map before its file is replaced
+    old_embeddings = None
+
+    if to_encode:
+        logger.info(f"Encoding {len(to_encode)} assessments...")
+        with span("encode_catalog", STARTUP_SECONDS):
+            encoded = model.encode([assessment_text(records[row]) for row in to_encode])
+        embeddings[to_encode] = np.asarray(encoded, dtype='float32')
+
+    with span("build_index", STARTUP_SECONDS):
+        if index is None:
+            index = make_index(dimension, embeddings, ids, backend)
+        else:
+            if stale_ids:
+                index.remove_ids(np.array(stale_ids, dtype='int64'))
+            if to_encode:
+                add_vectors(index, embeddings[to_encode], ids[to_encode])
+
+    sidecar = {
+        "catalog_hash": catalog_hash(records),
+        "model_name": MODEL_NAME,
+        "index_backend": backend,
+        "embeddings_dtype": EMBEDDINGS_DTYPE,
+        "dimension": int(dimension),
+        "count": len(records),
+        "next_id": next_id,
+        "ids": ids.tolist(),
+        "text_hashes": text_hashes,
+        "records": records
+    }
+    # The BM25 index is cheap to build, so it is always rebuilt from the full catalog
+    with span("build_lexical", STARTUP_SECONDS):
+        lexical = BM25Index.build((assessment_text(a) for a in records), ids)
+    catalog = ColumnarCatalog.from_records(records, ids, list(TEST_TYPE_NAMES))
+    with span("write_artifacts", STARTUP_SECONDS):
+        _write_artifacts(index_dir, index, embeddings, lexical, catalog, sidecar)
+
+    logger.info(f"Vector store written to {index_dir}")
+    embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+    return index, embeddings, dict(zip(sidecar["ids"], records))
+
+def load_vectorstore(expected_hash: str, index_dir: str = INDEX_DIR,
+                     mmap: bool = INDEX_MMAP) -> Optional[Tuple[faiss.Index, np.ndarray, Dict[int, Dict]]]:
+    """Load persisted artifacts, or return None if they are missing or stale"""
+    sidecar = _read_sidecar(index_dir)
+    if sidecar is None or "ids" not in sidecar:
+        return None
+
+    if sidecar.get("catalog_hash") != expected_hash:
+        logger.info("Catalog or model changed since the index was built")
+        return None
+
+    if sidecar.get("index_backend", "flat") != INDEX_BACKEND:
+        logger.info(f"Index backend changed to {INDEX_BACKEND}")
+        return None
+
+    if sidecar.get("embeddings_dtype", "float32") != EMBEDDINGS_DTYPE:
+        logger.info(f"Embeddings dtype changed to {EMBEDDINGS_DTYPE}")
+        return None
+
+    loaded = _load_artifacts(index_dir, sidecar, mmap=mmap)
+    if loaded is None:
+        return None
+
+    index, embeddings = loaded
+    return index, embeddings, dict(zip(sidecar["ids"], sidecar["records"]))
+
+def load_embeddings(index_dir: str = INDEX_DIR) -> np.ndarray:
+    """Memory-mapped embedding matrix, one row per assessment in metadata order"""
+    return np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode='r')
+
+def load_lexical_index(metadata: Dict[int, Dict], index_dir: str = INDEX_DIR) -> BM25Index:
+    """Load the persisted BM25 index, rebuilding it if it doesn't match `metadata`"""
+    path = os.path.join(index_dir, LEXICAL_FILE)
+    if os.path.exists(path):
+        lexical = BM25Index.load(path)
+        if np.array_equal(lexical.doc_ids, np.fromiter(metadata.keys(), dtype='int64', count=len(metadata))):
+            return lexical
+    logger.warning("Persisted BM25 index is missing or stale, rebuilding it in memory")
+    return BM25Index.build((assessment_text(a) for a in metadata.values()), metadata.keys())
+
+def load_catalog_store(metadata: Dict[int, Dict], index_dir: str = INDEX_DIR) -> ColumnarCatalog:
+    """Memory-map the persisted columnar catalog, rebuilding it if it doesn't match `metadata`"""
+    path = os.path.join(index_dir, CATALOG_FILE)
+    if os.path.exists(path):
+        catalog = ColumnarCatalog.load(path)
+        if np.array_equal(catalog.ids, np.fromiter(metadata.keys(), dtype='int64', count=len(metadata))):
+            return catalog
+    logger.warning("Persisted columnar catalog is missing or stale, rebuilding it in memory")
+    return ColumnarCatalog.from_records(list(metadata.values()), metadata.keys(), list(TEST_TYPE_NAMES))
+
+def prepare_vectorstore(model, catalog_path: str = CATALOG_PATH,
+                        rebuild: bool = False) -> Tuple[faiss.Index, Dict[int, Dict]]:
+    """Load the persisted index for the catalog at `catalog_path`, building or updating it if stale"""
+    # Reuse the persisted index unless the catalog or model changed
+    with span("load_catalog", STARTUP_SECONDS):
+        records = load_catalog(catalog_path)
+    with span("load_index", STARTUP_SECONDS):
+        loaded = None if rebuild else load_vectorstore(catalog_hash(records))
+    if loaded is not None:
+        index, _, metadata = loaded
+        logger.info(f"Loaded persisted index from {INDEX_DIR}")
+    else:
+        with span("build_vectorstore", STARTUP_SECONDS):
+            index, _, metadata = build_vectorstore(model, records, incremental=not rebuild)
+    return index, metadata
+
+def init_vectorstore(rebuild: bool = False, catalog_path: str = CATALOG_PATH):
     try:
         logger.info("Initializing vector store...")
         os.makedirs(MODEL_CACHE, exist_ok=True)
         
         # Load model
-        model = load_model()
+        with span("load_model", STARTUP_SECONDS):
+            model = load_model()
         
-        # Create embeddings
-        texts = [f"{a['name']} {a['description']} {' '.join(a['test_types'])}" for a in assessments]
-        embeddings = model.encode(texts)
-        embeddings = np.array(embeddings).astype('float32')
-        
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings)
+        index, metadata = prepare_vectorstore(model, catalog_path, rebuild)
         
         logger.info("Vector store initialized successfully")
-        return index, model, assessments
+        return index, model, metadata
         
     except Exception as e:
         logger.error(f"Error in init_vectorstore: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    init_vectorstore()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or update the persisted vector store")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="Catalog JSON to index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-encode every item instead of applying the diff")
+    args = parser.parse_args()
+    init_vectorstore(rebuild=args.rebuild, catalog_path=args.catalog)
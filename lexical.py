@@ -0,0 +1,115 @@
+import re
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9#+]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have i in is it looking my of on or our "
+    "that the their this to we who will with within".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords (keeps c++ / c# intact)"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored as flat NumPy arrays.
+
+    Postings are kept in CSR layout: the postings of term `t` are
+    `rows[offsets[t]:offsets[t + 1]]` with matching term frequencies in `tfs`.
+    Rows index into `doc_ids`, which holds the stable assessment IDs in the same
+    order as the rows of the embedding matrix.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, doc_ids: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms.tolist())}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.doc_ids = doc_ids
+        self.k1 = k1
+        self.b = b
+
+        n = len(doc_ids)
+        df = np.diff(offsets).astype('float32')
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype('float32')
+        self.length_norm = (k1 * (1 - b + b * doc_lengths / max(doc_lengths.mean(), 1e-9))).astype('float32') \
+            if n else np.zeros(0, dtype='float32')
+
+        # Sorted view of doc_ids for ID -> row lookups
+        self.id_order = np.argsort(doc_ids, kind='stable')
+        self.sorted_ids = doc_ids[self.id_order]
+
+    @classmethod
+    def build(cls, texts: Iterable[str], doc_ids: Iterable[int], **params) -> "BM25Index":
+        """Build the index from document texts and their stable IDs"""
+        vocab = {}
+        term_rows, term_ids, counts = [], [], []
+        doc_lengths = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            tf = {}
+            for token in tokens:
+                tf[token] = tf.get(token, 0) + 1
+            for token, count in tf.items():
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                term_rows.append(row)
+                counts.append(count)
+
+        term_ids = np.array(term_ids, dtype='int64')
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.zeros(len(vocab) + 1, dtype='int64')
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+
+        return cls(
+            terms=np.array(list(vocab), dtype='U'),
+            offsets=offsets,
+            rows=np.array(term_rows, dtype='int32')[order],
+            tfs=np.array(counts, dtype='float32')[order],
+            doc_lengths=np.array(doc_lengths, dtype='float32'),
+            doc_ids=np.fromiter(doc_ids, dtype='int64'),
+            **params
+        )
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, terms=self.terms, offsets=self.offsets, rows=self.rows, tfs=self.tfs,
+                     doc_lengths=self.doc_lengths, doc_ids=self.doc_ids)
+
+    @classmethod
+    def load(cls, path: str, **params) -> "BM25Index":
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files}, **params)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, scores) by BM25, best first; only postings of the query terms are touched"""
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+
+        rows, contributions = [], []
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            posting_rows = self.rows[start:end]
+            tf = self.tfs[start:end]
+            rows.append(posting_rows)
+            contributions.append(self.idf[t] * tf * (self.k1 + 1) / (tf + self.length_norm[posting_rows]))
+
+        rows = np.concatenate(rows)
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions)).astype('float32')
+
+        top = np.argsort(-scores, kind='stable')[:k]
+        return self.doc_ids[candidates[top]], scores[top]
+
+    def rows_for(self, ids: np.ndarray) -> np.ndarray:
+        """Embedding-matrix rows of the given assessment IDs"""
+        return self.id_order[np.searchsorted(self.sorted_ids, ids)]
@@ -0,0 +1,215 @@
+import bisect
+import collections
+import math
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: 0.5 ms to 10 s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STARTUP_BUCKETS = (0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+class Metric:
+    """Base for metrics rendered in the Prometheus text exposition format"""
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+class _Value(Metric):
+    """Metric holding one number per label set, or reading them from `function` at scrape time.
+
+    `function` returns a number for an unlabelled metric, or a dict mapping label
+    values (a tuple, or a plain value for one label) to numbers.
+    """
+
+    def __init__(self, *args, function: Optional[Callable] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            result = self.function()
+            values = result.items() if isinstance(result, dict) else [((), result)]
+        else:
+            with self.lock:
+                values = list(self.values.items())
+        for key, value in values:
+            if not isinstance(key, tuple):
+                key = (key,)
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+class Counter(_Value):
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+class Gauge(_Value):
+    """Value that can go up and down"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram, as Prometheus expects"""
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[str, ...], List] = {}  # key -> [bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self.lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        for key, counts, total, count in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+class Registry:
+    """The set of metrics exposed at /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        self.metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram("shl_stage_seconds", "Time spent in each stage of serving a recommendation",
+                          labelnames=("stage",))
+STARTUP_SECONDS = Histogram("shl_startup_stage_seconds", "Time spent in each stage of loading or building the index",
+                            labelnames=("stage",), buckets=STARTUP_BUCKETS)
+
+@contextmanager
+def span(stage: str, histogram: Histogram = STAGE_SECONDS):
+    """Time the enclosed block into `histogram` under `stage`, whether or not it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, stage=stage)
+
+class SamplingProfiler:
+    """Statistical profiler that samples the stacks of every thread at a fixed interval.
+
+    Runs on a daemon thread, so it can be started and stopped while the server
+    is live. Stacks are aggregated in the collapsed format that flamegraph.pl
+    and speedscope read: one `frame;frame;frame count` line per distinct stack.
+    """
+
+    def __init__(self):
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.interval = 0.0
+        self.started_at: Optional[float] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval_ms: float = 5.0):
+        """Start sampling, discarding the previous profile"""
+        if self.running:
+            return
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.interval = interval_ms / 1000.0
+        self.started_at = time.time()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks"""
+        if self.running:
+            self.stopping.set()
+            self.thread.join()
+        return self.collapsed()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                frames = [f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})"
+                          for f in traceback.extract_stack(frame)]
+                self.stacks[";".join([names.get(ident, str(ident))] + frames)] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        stacks = dict(self.stacks)  # a snapshot, as the sampler may still be adding to it
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda s: -s[1]))
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "started_at": self.started_at
+        }
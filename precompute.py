@@ -0,0 +1,240 @@
+"""Precomputed recommendations for popular and canonical queries.
+
+    python precompute.py --queries data/canonical_queries.txt logs/queries.jsonl --top 200
+    python precompute.py --refresh   # recompute the stored queries against the current index
+
+Every query is ranked for every combination of the filter grid, and the ranked
+IDs are written to a lookup table keyed on a hash of the normalized request. The
+API answers a matching request from the table without encoding or searching. A
+table belongs to one index version; once the index changes the API recomputes
+it in the background from the queries it stores, and never serves stale entries.
+Workers refreshing at once take turns on a lock file, so only the first one
+recomputes and the others load what it wrote.
+"""
+import argparse
+import fcntl
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from cache import normalize_query
+from chunking import encode_queries
+from init_vectorstore import CATALOG_PATH, INDEX_DIR, _atomic_write, init_vectorstore
+from rerank import RERANK_CANDIDATES, RERANK_ENABLED, CrossEncoderReranker, load_cross_encoder
+from search import DENSE_WEIGHT, LEXICAL_CANDIDATES, LEXICAL_WEIGHT, SearchRequest, hybrid_search
+from snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTED_PATH = os.environ.get("PRECOMPUTED_PATH", os.path.join(INDEX_DIR, 'precomputed.npz'))
+
+# Filter grid, overridable from the environment. The default grid is 5 durations x 3 remote
+# testing x 3 adaptive x (no type or one of 8 types) = 405 entries per query and result limit.
+PRECOMPUTE_MAX_RESULTS = [int(v) for v in os.environ.get("PRECOMPUTE_MAX_RESULTS", "10").split(",")]
+PRECOMPUTE_MAX_DURATIONS = [int(v) for v in os.environ.get("PRECOMPUTE_MAX_DURATIONS", "30,45,60,90,120").split(",")]
+PRECOMPUTE_BATCH_SIZE = int(os.environ.get("PRECOMPUTE_BATCH_SIZE", "256"))
+
+def request_hash(request: SearchRequest) -> int:
+    """64-bit key of a request: its normalized query, result limit, filters, weights and rerank flag"""
+    key = repr(request.cache_key(normalize_query)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def read_queries(paths: Sequence[str], top: Optional[int] = None) -> List[str]:
+    """Normalized queries from seed lists (one per line) or JSON-lines query logs with a "query" field,
+    most frequent first"""
+    counts = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                query = json.loads(line).get("query", "") if line.startswith("{") else line
+                if normalize_query(query):
+                    counts[normalize_query(query)] += 1
+    return [query for query, _ in counts.most_common(top)]
+
+def filter_grid(type_codes: Iterable[str], max_results: Sequence[int] = PRECOMPUTE_MAX_RESULTS,
+                max_durations: Sequence[int] = PRECOMPUTE_MAX_DURATIONS, rerank: bool = False) -> List[Dict]:
+    """Every combination of result limit, duration limit, remote testing, adaptivity and single test type.
+
+    Fusion weights are the API defaults, so the entries match requests that don't set them.
+    """
+    types = [()] + [(code,) for code in sorted(type_codes)]
+    return [
+        {"max_results": k, "max_duration": duration, "dense_weight": DENSE_WEIGHT, "lexical_weight": LEXICAL_WEIGHT,
+         "remote_testing": remote, "adaptive": adaptive, "test_types": list(test_types), "rerank": rerank}
+        for k, duration, remote, adaptive, test_types in itertools.product(
+            max_results, max_durations, (None, True, False), (None, True, False), types)
+    ]
+
+def grid_request(query: str, combination: Dict) -> SearchRequest:
+    return SearchRequest(query, **{**combination, "test_types": tuple(combination["test_types"])})
+
+class PrecomputedTable:
+    """Ranked IDs per request hash, for one index version.
+
+    Keys are sorted so a lookup is one binary search; the results of key `i` are
+    `ids[offsets[i]:offsets[i + 1]]`. The queries and filter grid are kept so the
+    table can be recomputed for a new index version.
+    """
+
+    def __init__(self, version: str, keys: np.ndarray, offsets: np.ndarray, ids: np.ndarray,
+                 queries: List[str], grid: List[Dict]):
+        self.version = version
+        self.keys = keys
+        self.offsets = offsets
+        self.ids = ids
+        self.queries = queries
+        self.grid = grid
+
+    @classmethod
+    def build(cls, version: str, requests: List[SearchRequest], results: List[np.ndarray],
+              queries: List[str], grid: List[Dict]) -> "PrecomputedTable":
+        hashes = np.array([request_hash(r) for r in requests], dtype='uint64')
+        order = np.argsort(hashes, kind='stable')
+        keys, first = np.unique(hashes[order], return_index=True)
+        ranked = [results[i] for i in order[first]]
+        offsets = np.zeros(len(keys) + 1, dtype='int64')
+        np.cumsum([len(r) for r in ranked], out=offsets[1:])
+        ids = np.concatenate(ranked).astype('int32') if ranked else np.empty(0, dtype='int32')
+        return cls(version, keys, offsets, ids, queries, grid)
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            np.savez(f, version=np.array(self.version), keys=self.keys, offsets=self.offsets, ids=self.ids,
+                     queries=np.array(self.queries, dtype=str), grid=np.array(json.dumps(self.grid)))
+
+    @classmethod
+    def load(cls, path: str) -> "PrecomputedTable":
+        with np.load(path) as data:
+            return cls(str(data["version"]), data["keys"], data["offsets"], data["ids"],
+                       data["queries"].tolist(), json.loads(str(data["grid"])))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, request: SearchRequest) -> Optional[np.ndarray]:
+        """Ranked IDs for `request`, or None if it wasn't precomputed"""
+        key = np.uint64(request_hash(request))
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+    def stats(self) -> Dict:
+        return {"version": self.version, "entries": len(self), "queries": len(self.queries),
+                "bytes": self.keys.nbytes + self.offsets.nbytes + self.ids.nbytes}
+
+def precompute(model, snapshot: Snapshot, queries: List[str], grid: List[Dict],
+               reranker: Optional[CrossEncoderReranker] = None,
+               batch_size: int = PRECOMPUTE_BATCH_SIZE) -> PrecomputedTable:
+    """Rank every query for every grid combination on `snapshot`, the way the API would"""
+    start = time.perf_counter()
+    query_embeddings = encode_queries(model, queries) if queries else None
+    requests, results = [], []
+    # One combination at a time, so each batch shares one filter selector
+    for combination in grid:
+        for offset in range(0, len(queries), batch_size):
+            batch = [grid_request(q, combination) for q in queries[offset:offset + batch_size]]
+            first_stage = [r._replace(max_results=max(r.max_results, RERANK_CANDIDATES)) if r.rerank else r
+                           for r in batch]
+            ranked = hybrid_search(snapshot.index, snapshot.attribute_filter, snapshot.lexical_index,
+                                   snapshot.embeddings, query_embeddings[offset:offset + len(batch)], first_stage,
+                                   lexical_candidates=LEXICAL_CANDIDATES)
+            if combination["rerank"]:
+                if reranker is None:
+                    raise ValueError("The filter grid re-ranks, but no cross-encoder was given")
+                ranked = [ids for ids, _ in reranker.rerank([r.query for r in batch], ranked, [None] * len(batch))]
+            requests.extend(batch)
+            results.extend(ids[:r.max_results] for ids, r in zip(ranked, batch))
+
+    table = PrecomputedTable.build(snapshot.version, requests, results, queries, grid)
+    logger.info(f"Precomputed {len(table)} results for {len(queries)} queries in "
+                f"{time.perf_counter() - start:.1f}s ({table.stats()['bytes'] / 2 ** 20:.1f} MB)")
+    return table
+
+def load_table(path: str = PRECOMPUTED_PATH) -> Optional[PrecomputedTable]:
+    if not os.path.exists(path):
+        return None
+    try:
+        return PrecomputedTable.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Unreadable precomputed table {path}: {str(e)}")
+        return None
+
+def save_table(table: PrecomputedTable, path: str = PRECOMPUTED_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    _atomic_write(path, table.save)
+
+@contextmanager
+def refresh_lock(path: str = PRECOMPUTED_PATH):
+    """Exclusive lock on the table across processes, held while it is checked and recomputed"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def refresh_table(model, snapshot: Snapshot, reranker: Optional[CrossEncoderReranker] = None,
+                  path: str = PRECOMPUTED_PATH) -> Optional[PrecomputedTable]:
+    """The table for `snapshot`, recomputed from the stored queries and grid if it's for another version.
+
+    Runs under `refresh_lock`, so when several workers refresh after the same swap, the
+    first recomputes and publishes the table and the others find it current and load it.
+    """
+    with refresh_lock(path):
+        table = load_table(path)
+        if table is None or table.version == snapshot.version:
+            return table
+
+        logger.info(f"Precomputed table is for index version {table.version[:12]}, recomputing")
+        table = precompute(model, snapshot, table.queries, table.grid, reranker)
+        save_table(table, path)
+        return table
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute recommendations for canonical queries")
+    parser.add_argument("--queries", nargs="+", help="Seed lists (one query per line) or JSON-lines query logs")
+    parser.add_argument("--top", type=int, help="Keep only the most frequent queries")
+    parser.add_argument("--refresh", action="store_true", help="Recompute the existing table for the current index")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="Catalog JSON the index is built from")
+    parser.add_argument("--output", default=PRECOMPUTED_PATH)
+    parser.add_argument("--max-results", type=int, nargs="+", default=PRECOMPUTE_MAX_RESULTS)
+    parser.add_argument("--max-durations", type=int, nargs="+", default=PRECOMPUTE_MAX_DURATIONS)
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=RERANK_ENABLED,
+                        help="Re-rank with the cross-encoder, as the API does when RERANK_ENABLED=1")
+    args = parser.parse_args()
+    if not args.queries and not args.refresh:
+        parser.error("give --queries or --refresh")
+
+    table = load_table(args.output) if args.refresh else None
+    if args.refresh and table is None:
+        logger.info(f"No precomputed table at {args.output}, nothing to refresh")
+        return
+    # A refresh keeps the stored grid, including whether it was re-ranked
+    rerank = any(combination["rerank"] for combination in table.grid) if table is not None else args.rerank
+
+    index, model, metadata = init_vectorstore(catalog_path=args.catalog)
+    snapshot = Snapshot(index, metadata)
+    reranker = CrossEncoderReranker(load_cross_encoder(), snapshot.texts) if rerank else None
+    if args.refresh:
+        refresh_table(model, snapshot, reranker, args.output)
+        return
+
+    queries = read_queries(args.queries, args.top)
+    grid = filter_grid(snapshot.catalog.type_codes, args.max_results, args.max_durations, rerank)
+    save_table(precompute(model, snapshot, queries, grid, reranker), args.output)
+
+if __name__ == "__main__":
+    main()
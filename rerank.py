@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import LRUCache, normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Cross-encoder settings, overridable from the environment; the API re-ranks only when enabled
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "20"))  # first-stage results re-scored per query
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", "32"))  # (query, assessment) pairs per forward pass
+RERANK_MAX_LENGTH = int(os.environ.get("RERANK_MAX_LENGTH", "256"))  # tokens per pair
+RERANK_CACHE_SIZE = int(os.environ.get("RERANK_CACHE_SIZE", "50000"))
+
+def load_cross_encoder(model_name: str = RERANK_MODEL, max_length: int = RERANK_MAX_LENGTH):
+    from sentence_transformers import CrossEncoder
+
+    logger.info(f"Loading cross-encoder {model_name}")
+    return CrossEncoder(model_name, max_length=max_length)
+
+def query_hash(query: str) -> bytes:
+    """Short digest of the normalized query, so long job descriptions make small cache keys"""
+    return hashlib.blake2b(normalize_query(query).encode("utf-8"), digest_size=8).digest()
+
+class CrossEncoderReranker:
+    """Second stage that re-scores first-stage candidates with a cross-encoder.
+
+    Uncached (query, assessment) pairs are scored in batches, query by query, and
+    each score is cached under (query hash, assessment ID). Before every batch the
+    expected scoring time, from a running per-pair average, is checked against the
+    deadline; queries not fully scored by then keep their first-stage order.
+    With `model=None` the default cross-encoder is loaded on first use.
+    """
+
+    def __init__(self, model, texts: Callable[[np.ndarray], List[str]], batch_size: int = RERANK_BATCH_SIZE,
+                 cache_size: int = RERANK_CACHE_SIZE):
+        self.model = model
+        self.texts = texts
+        self.batch_size = batch_size
+        self.scores = LRUCache(maxsize=cache_size)
+        self.seconds_per_pair: Optional[float] = None
+
+        # Metrics
+        self.reranked = 0
+        self.fallbacks = 0
+
+    def _score(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        if self.model is None:
+            self.model = load_cross_encoder()
+        start = time.perf_counter()
+        scores = np.asarray(self.model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+                            dtype='float32').reshape(len(pairs))
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        # Exponential average, so the estimate follows load without jumping on one slow batch
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else \
+            0.8 * self.seconds_per_pair + 0.2 * per_pair
+        return scores
+
+    def warm_up(self):
+        """Load the model and score one pair, so the first deadline check has an estimate"""
+        self._score([("warm up", "warm up")])
+
+    def _fits(self, pairs: int, deadline: Optional[float]) -> bool:
+        if deadline is None or self.seconds_per_pair is None:
+            return True
+        return time.perf_counter() + pairs * self.seconds_per_pair <= deadline
+
+    def rerank(self, queries: Sequence[str], candidates: Sequence[np.ndarray], deadlines: Sequence[Optional[float]],
+               texts: Optional[Callable[[np.ndarray], List[str]]] = None) -> List[Tuple[np.ndarray, bool]]:
+        """Candidates of each query re-ordered by cross-encoder score, best first.
+
+        Returns (ids, reranked) per query; `reranked` is False when the query's
+        deadline (a `time.perf_counter()` value) left its first-stage order in place.
+        `texts` overrides the constructor's lookup of assessment text by ID.
+        """
+        texts = texts or self.texts
+        keys = [query_hash(q) for q in queries]
+        scored: List[np.ndarray] = []
+        pending: List[Tuple[int, int, Tuple[str, str]]] = []  # (query, position, pair)
+        for i, (query, key, ids) in enumerate(zip(queries, keys, candidates)):
+            scores = np.array([self.scores.get((key, item_id), np.nan) for item_id in ids.tolist()], dtype='float32')
+            missing = np.flatnonzero(np.isnan(scores))
+            if len(missing):
+                pending.extend((i, position, (query, text))
+                               for position, text in zip(missing.tolist(), texts(ids[missing])))
+            scored.append(scores)
+
+        # Pairs are in query order, so when the deadline cuts scoring short the earlier queries are complete
+        expired = set()
+        for start in range(0, len(pending), self.batch_size):
+            batch = [p for p in pending[start:start + self.batch_size] if p[0] not in expired]
+            expired.update(i for i in {p[0] for p in batch} if not self._fits(len(batch), deadlines[i]))
+            batch = [p for p in batch if p[0] not in expired]
+            if not batch:
+                continue
+            for (i, position, _), score in zip(batch, self._score([pair for _, _, pair in batch])):
+                scored[i][position] = score
+                self.scores.put((keys[i], int(candidates[i][position])), float(score))
+
+        results = []
+        for i, (ids, scores) in enumerate(zip(candidates, scored)):
+            if i in expired or np.isnan(scores).any():
+                self.fallbacks += 1
+                results.append((ids, False))
+            else:
+                self.reranked += 1
+                results.append((ids[np.argsort(-scores, kind='stable')], True))
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "ms_per_pair": 1000 * self.seconds_per_pair if self.seconds_per_pair is not None else None,
+            "score_cache": self.scores.stats()
+        }
@@ -1,101 +1,342 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
 import json
-import time
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urljoin, urlparse
 
-def scrape_catalog(headless=True):
-    url = "https://www.shl.com/solutions/products/product-catalog/"
-    driver = None
+import httpx
+from lxml import html as lxml_html
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://www.shl.com"
+CATALOG_URL = f"{BASE_URL}/solutions/products/product-catalog/"
+
+# Scraper settings, overridable from the environment
+SCRAPER_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "8"))
+SCRAPER_TIMEOUT = float(os.environ.get("SCRAPER_TIMEOUT", "30"))
+OUTPUT_PATH = os.path.join("data", "catalog.jsonl")
+CATALOG_PATH = os.path.join("data", "catalog.json")
+STATE_PATH = os.path.join("data", "scrape_state.json")
+
+DURATION_PATTERN = re.compile(r"minutes\s*=\s*(\d+)", re.IGNORECASE)
+
+def _has_class(cls: str) -> str:
+    """XPath predicate matching one class among several"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+def parse_catalog_page(page: str, base_url: str = CATALOG_URL) -> Tuple[List[Dict], List[str]]:
+    """Products listed on a catalog page and the URLs of every listing page it paginates to.
+
+    Works on the static HTML (fetched, or rendered and saved like
+    `data/rendered_page.html`), so no browser call is made per row.
+    """
+    tree = lxml_html.fromstring(page)
     products = []
+    for row in tree.xpath("//table//tr[td]"):
+        cols = row.xpath("./td")
+        links = cols[0].xpath(".//a[@href]") if cols else []
+        if len(cols) < 4 or not links:
+            continue
+        products.append({
+            "name": links[0].text_content().strip(),
+            "url": urljoin(base_url, links[0].get("href")),
+            "remote_testing": bool(cols[1].xpath(f".//span[{_has_class('catalogue__circle')}]")),
+            "adaptive": bool(cols[2].xpath(f".//span[{_has_class('catalogue__circle')}]")),
+            "test_types": [s.text_content().strip()
+                           for s in cols[3].xpath(f".//span[{_has_class('product-catalogue__key')}]")]
+        })
+
+    return products, listing_urls(tree.xpath(f"//ul[{_has_class('pagination')}]//a/@href"), base_url)
+
+def listing_urls(hrefs: List[str], base_url: str = CATALOG_URL) -> List[str]:
+    """Every listing page implied by pagination links.
+
+    Pagination only shows a few pages around the current one plus the last, so
+    the full `start` range of each catalog type is filled in from the page step.
+    """
+    starts: Dict[str, Set[int]] = {}
+    for href in hrefs:
+        query = parse_qs(urlparse(href).query)
+        if "start" in query and "type" in query:
+            starts.setdefault(query["type"][0], set()).add(int(query["start"][0]))
 
+    urls = []
+    for catalog_type, values in sorted(starts.items()):
+        positive = [v for v in values if v > 0]
+        if not positive:
+            continue
+        for start in range(0, max(positive) + 1, min(positive)):
+            urls.append(urljoin(base_url, f"?start={start}&type={catalog_type}"))
+    return urls
+
+def parse_detail_page(page: str) -> Dict:
+    """Description and duration (minutes) from a product's detail page"""
+    tree = lxml_html.fromstring(page)
+    details = {"description": "", "duration": 0}
+    for heading in tree.xpath("//h4"):
+        title = heading.text_content().strip().lower()
+        value = " ".join(p.text_content().strip() for p in heading.xpath("following-sibling::p"))
+        if title == "description":
+            details["description"] = " ".join(value.split())
+        elif title == "assessment length":
+            match = DURATION_PATTERN.search(value)
+            if match:
+                details["duration"] = int(match.group(1))
+
+    if not details["duration"]:
+        match = DURATION_PATTERN.search(tree.text_content())
+        if match:
+            details["duration"] = int(match.group(1))
+    return details
+
+def _retryable(error: BaseException) -> bool:
+    """Transport errors, rate limiting and server errors are worth another attempt"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+@retry(
+    retry=retry_if_exception(_retryable),
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(3),
+    reraise=True
+)
+def fetch_page(client: httpx.Client, url: str) -> str:
+    response = client.get(url)
+    response.raise_for_status()
+    return response.text
+
+def render_page(url: str = CATALOG_URL, headless: bool = True) -> str:
+    """HTML of a page after a headless Chrome has rendered it, for when the static HTML isn't enough"""
+    # Imported here so the static scraper runs without Selenium installed
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
     try:
-        print("Setting up Chrome driver...")
-        options = webdriver.ChromeOptions()
-        if headless:
-            options.add_argument("--headless=new")
-        
-        options.add_argument("--start-maximized") 
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        
-        driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=options
-        )
-        
         driver.get(url)
-        
-        # Wait for table to load
-        print("Waiting for product table...")
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.TAG_NAME, "table"))
-        )
-        
-        # Get all product rows
-        rows = driver.find_elements(By.CSS_SELECTOR, "table tbody tr")
-        print(f"Found {len(rows)} products")
-
-        for row in rows:
-            try:
-                # Skip header row
-                if row.get_attribute("role") == "columnheader":
-                    continue
-                    
-                cols = row.find_elements(By.TAG_NAME, "td")
-                if len(cols) < 4:
+        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "table")))
+        # One round trip for the whole document; rows are parsed locally
+        return driver.page_source
+    finally:
+        driver.quit()
+
+class Checkpoint:
+    """Crawl progress kept on disk so an interrupted run can resume.
+
+    `listings` maps each discovered listing URL to whether it has been parsed.
+    `pending` holds listed products whose detail page is not in the output yet.
+    Finished products live in the JSON Lines output, which is the source of truth.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.listings: Dict[str, bool] = {}
+        self.pending: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.listings = state.get("listings", {})
+            self.pending = state.get("pending", {})
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"listings": self.listings, "pending": self.pending}, f)
+        os.replace(tmp_path, self.path)
+
+def read_output(path: str) -> List[Dict]:
+    """Records already written, skipping a line cut short by an interrupted run"""
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
                     continue
+    return records
 
-                # Get product info
-                name_link = cols[0].find_element(By.TAG_NAME, "a")
-                name = name_link.text.strip()
-                url = name_link.get_attribute("href")
-                
-                remote = bool(cols[1].find_elements(By.CLASS_NAME, "catalogue__circle"))
-                adaptive = bool(cols[2].find_elements(By.CLASS_NAME, "catalogue__circle"))
-                
-                # Get test types
-                test_types = []
-                type_spans = cols[3].find_elements(By.CLASS_NAME, "product-catalogue__key")
-                for span in type_spans:
-                    test_type = span.text.strip()
-                    test_types.append(test_type)
-
-                product = {
-                    "name": name,
-                    "url": url,
-                    "remote_testing": remote,
-                    "adaptive": adaptive,
-                    "test_types": test_types
-                }
-                products.append(product)
-                
-            except Exception as e:
-                print(f"Error processing row: {str(e)}")
-                continue
-
-        print(f"Successfully processed {len(products)} products")
-        
-        # Save to JSON file
-        with open("data/catalog.json", "w") as f:
-            json.dump(products, f, indent=2)
-            
-    except Exception as e:
-        print(f"Error: {str(e)}")
-    finally:
-        if driver:
-            driver.quit()
-            
-    return products
+def write_catalog(records: List[Dict], path: str = CATALOG_PATH) -> List[Dict]:
+    """Consolidate JSON Lines records into the catalog JSON, the latest record per URL winning"""
+    catalog = list({r["url"]: r for r in records}.values())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalog, f, indent=2)
+    os.replace(tmp_path, path)
+    return catalog
+
+def scrape_catalog(pages: Optional[List[str]] = None, follow_pagination: bool = True, details: bool = True,
+                   output: str = OUTPUT_PATH, catalog_path: str = CATALOG_PATH, state_path: str = STATE_PATH,
+                   workers: int = SCRAPER_WORKERS, resume: bool = True) -> List[Dict]:
+    """Crawl listing and detail pages concurrently, appending each finished product to `output`.
+
+    Listings start from `CATALOG_URL`, or from already-fetched `pages` (static
+    HTML) when given. A pool of `workers` threads fetches listing pages and
+    product detail pages over one pooled HTTP client; parsing results are merged
+    on the calling thread, which alone writes the output and the checkpoint.
+    Products are written as JSON Lines as soon as their details arrive, and the
+    whole output is consolidated into `catalog_path` at the end.
+    """
+    if not resume:
+        for path in (output, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+    for path in (output, catalog_path, state_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    state = Checkpoint(state_path)
+    done = {r["url"] for r in read_output(output)}
+    if done or state.listings:
+        logger.info(f"Resuming: {len(done)} products done, {len(state.pending)} pending, "
+                    f"{sum(not v for v in state.listings.values())} listing pages left")
+
+    seeded = []
+    for page in pages or []:
+        products, urls = parse_catalog_page(page)
+        seeded.extend(products)
+        if follow_pagination:
+            for url in urls:
+                state.listings.setdefault(url, False)
+    if pages is None and not state.listings:
+        state.listings[CATALOG_URL] = False
+
+    client = httpx.Client(
+        timeout=httpx.Timeout(SCRAPER_TIMEOUT),
+        limits=httpx.Limits(max_connections=workers, max_keepalive_connections=workers),
+        follow_redirects=True,
+        headers={"User-Agent": "shl-recommendation/1.0"}
+    )
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scraper")
+    futures = {}
+    failed = 0
+
+    # A run killed mid-write leaves a partial last line; start the next record on its own line
+    if os.path.exists(output) and os.path.getsize(output):
+        with open(output, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    with open(output, "a") as out:
+        def write(record: Dict):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            done.add(record["url"])
+            state.pending.pop(record["url"], None)
+
+        def add_product(product: Dict):
+            url = product["url"]
+            if url in done or url in state.pending:
+                return
+            state.pending[url] = product
+            if details:
+                futures[executor.submit(lambda: parse_detail_page(fetch_page(client, url)))] = ("detail", url)
+            else:
+                write(product)
+
+        def add_listing(url: str):
+            futures[executor.submit(lambda: parse_catalog_page(fetch_page(client, url), url))] = ("listing", url)
+
+        try:
+            for url, product in list(state.pending.items()):
+                if url in done:
+                    state.pending.pop(url)
+                elif details:
+                    futures[executor.submit(lambda u=url: parse_detail_page(fetch_page(client, u)))] = ("detail", url)
+                else:
+                    write(product)
+            for product in seeded:
+                add_product(product)
+            for url, parsed in list(state.listings.items()):
+                if not parsed:
+                    add_listing(url)
+            state.save()
+
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    kind, url = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # Left unfinished in the checkpoint, so the next run retries it
+                        logger.warning(f"Failed to scrape {url}: {str(e)}")
+                        failed += 1
+                        continue
+
+                    if kind == "listing":
+                        products, urls = result
+                        for next_url in urls:
+                            if next_url not in state.listings:
+                                state.listings[next_url] = False
+                                add_listing(next_url)
+                        state.listings[url] = True
+                        for product in products:
+                            add_product(product)
+                        state.save()
+                    else:
+                        write({**state.pending[url], **result})
+                        logger.info(f"Scraped {len(done)} products, {len(futures)} pages queued")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            client.close()
+            state.save()
+
+    if failed:
+        logger.warning(f"{failed} pages failed; run again to resume them")
+    catalog = write_catalog(read_output(output), catalog_path)
+    logger.info(f"Wrote {len(catalog)} products to {catalog_path}")
+    return catalog
 
 if __name__ == "__main__":
-    scrape_catalog()
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
+    parser = argparse.ArgumentParser(description="Scrape the SHL product catalog")
+    parser.add_argument("--html", nargs="+", help="Parse saved listing pages instead of fetching the first one")
+    parser.add_argument("--render", action="store_true", help="Render the first listing page with Selenium")
+    parser.add_argument("--no-details", action="store_true", help="Skip product detail pages (no description or duration)")
+    parser.add_argument("--workers", type=int, default=SCRAPER_WORKERS, help="Concurrent page fetches")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="JSON Lines output, appended as products finish")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="Consolidated catalog JSON")
+    parser.add_argument("--state", default=STATE_PATH, help="Checkpoint file used to resume")
+    parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint and previous output")
+    args = parser.parse_args()
 
+    pages = None
+    if args.html:
+        pages = []
+        for path in args.html:
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+    elif args.render:
+        pages = [render_page()]
 
+    scrape_catalog(
+        pages=pages,
+        follow_pagination=pages is None or args.render,
+        details=not args.no_details,
+        output=args.output,
+        catalog_path=args.catalog,
+        state_path=args.state,
+        workers=args.workers,
+        resume=not args.fresh
+    )
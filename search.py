@@ -0,0 +1,291 @@
+import faiss
+import numpy as np
+import os
+from collections import defaultdict
+from typing import List, NamedTuple, Optional, Tuple
+from indexes import SEARCH_PARAMS, is_approximate, is_binary, search_index, search_parameters
+from lexical import BM25Index
+from catalog import ColumnarCatalog
+from metrics import span
+from cache import LRUCache
+
+# Hybrid retrieval settings: default fusion weights and BM25 candidate pool size
+DENSE_WEIGHT = float(os.environ.get("DENSE_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.environ.get("LEXICAL_WEIGHT", "1.0"))
+LEXICAL_CANDIDATES = int(os.environ.get("LEXICAL_CANDIDATES", "100"))
+
+class SearchRequest(NamedTuple):
+    """One query with its result limit, filters and fusion weights"""
+    query: str
+    max_results: int
+    max_duration: Optional[int] = None
+    dense_weight: float = 1.0
+    lexical_weight: float = 0.0
+    min_duration: Optional[int] = None
+    remote_testing: Optional[bool] = None
+    adaptive: Optional[bool] = None
+    test_types: Tuple[str, ...] = ()
+    all_test_types: bool = False
+    rerank: bool = False
+
+    def cache_key(self, normalize) -> tuple:
+        return (normalize(self.query),) + tuple(self[1:])
+
+    def filter_key(self) -> tuple:
+        """The attribute filter of this request; requests with equal keys share a selector"""
+        return (self.min_duration, self.max_duration, self.remote_testing, self.adaptive,
+                self.test_types, self.all_test_types and len(self.test_types) > 1)
+
+class AttributeFilter:
+    """Bitmap indexes over catalog attributes, intersected into FAISS ID selectors.
+
+    Every bitmap is packed over the assessment ID space (bit `i` is ID `i`), so a
+    filter is a few byte-wise ANDs and the result is used directly as an
+    `IDSelectorBitmap`: FAISS only scores eligible IDs. Remote/adaptive flags and
+    each test type have a precomputed bitmap; duration ranges are cut from the IDs
+    sorted by duration. Selectors are built on first use of a filter and cached.
+    """
+
+    def __init__(self, catalog: ColumnarCatalog, max_selectors: int = 256):
+        self.catalog = catalog
+        self.id_space = int(catalog.ids.max()) + 1 if len(catalog) else 0
+        self.all = self._pack(catalog.ids)
+
+        order = np.argsort(catalog.durations, kind='stable')
+        self.ids_by_duration = catalog.ids[order]
+        self.sorted_durations = catalog.durations[order]
+
+        self.flags = {
+            (name, value): self._pack(catalog.ids[getattr(catalog, name) == value])
+            for name in ("remote_testing", "adaptive") for value in (True, False)
+        }
+        self.types = {
+            code: self._pack(catalog.ids[(catalog.test_types & bit) != 0])
+            for code, bit in catalog.type_bits.items()
+        }
+        self.selectors = LRUCache(maxsize=max_selectors)
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def _pack(self, ids: np.ndarray) -> np.ndarray:
+        bits = np.zeros(self.id_space, dtype=bool)
+        bits[ids] = True
+        return np.packbits(bits, bitorder='little')
+
+    def bitmap(self, request: SearchRequest) -> Optional[np.ndarray]:
+        """Packed bitmap of the IDs passing the request's filters, or None when nothing is filtered"""
+        parts = []
+        if request.min_duration is not None or request.max_duration is not None:
+            lo = 0 if request.min_duration is None else \
+                np.searchsorted(self.sorted_durations, request.min_duration, side='left')
+            hi = len(self.sorted_durations) if request.max_duration is None else \
+                np.searchsorted(self.sorted_durations, request.max_duration, side='right')
+            parts.append(self._pack(self.ids_by_duration[lo:hi]))
+        for name in ("remote_testing", "adaptive"):
+            value = getattr(request, name)
+            if value is not None:
+                parts.append(self.flags[(name, value)])
+        if request.test_types:
+            empty = np.zeros_like(self.all)
+            type_bitmaps = [self.types.get(code, empty) for code in request.test_types]
+            combine = np.bitwise_and if request.all_test_types else np.bitwise_or
+            parts.append(combine.reduce(type_bitmaps))
+
+        if not parts:
+            return None
+        return np.bitwise_and.reduce(parts + [self.all])
+
+    def lookup(self, request: SearchRequest) -> Tuple[int, Optional[faiss.IDSelector]]:
+        """Number of eligible assessments and the selector for them (None means no filtering)"""
+        key = request.filter_key()
+        cached = self.selectors.get(key)
+        if cached is not None:
+            return cached
+
+        bitmap = self.bitmap(request)
+        if bitmap is None:
+            result = (len(self), None)
+        else:
+            count = int(np.unpackbits(bitmap).sum())
+            if count == len(self):
+                result = (count, None)
+            else:
+                selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+                selector.packed = bitmap  # FAISS only keeps a pointer, so the array must outlive it
+                result = (count, selector)
+        self.selectors.put(key, result)
+        return result
+
+    def eligible(self, ids: np.ndarray, request: SearchRequest) -> np.ndarray:
+        """Boolean mask of the `ids` passing the request's filters"""
+        _, selector = self.lookup(request)
+        if selector is None:
+            return np.ones(len(ids), dtype=bool)
+        return ((selector.packed[ids >> 3] >> (ids & 7)) & 1).astype(bool)
+
+def filtered_search(index: faiss.Index, attribute_filter: AttributeFilter, query_embeddings: np.ndarray,
+                    requests: List[SearchRequest], embeddings: Optional[np.ndarray] = None,
+                    **params) -> List[np.ndarray]:
+    """Search each query for its top `max_results` IDs under its attribute filters.
+
+    Rows of `query_embeddings` match `requests`. Rows sharing a filter are
+    searched together, and the filter is applied inside FAISS so only eligible
+    IDs are ever ranked. Binary indexes need `embeddings` to re-rank candidates;
+    HNSW and IVF indexes use them to rank selective filters exactly.
+    """
+    results: List[np.ndarray] = [np.empty(0, dtype='int64')] * len(requests)
+
+    groups = defaultdict(list)
+    for row, request in enumerate(requests):
+        groups[request.filter_key()].append(row)
+
+    for rows in groups.values():
+        count, selector = attribute_filter.lookup(requests[rows[0]])
+        k = min(max(requests[row].max_results for row in rows), count)
+        if k == 0:
+            continue
+
+        if is_binary(index):
+            indices = _binary_search(index, attribute_filter, embeddings, query_embeddings[rows],
+                                     requests[rows[0]], k, count, **params)
+        elif selector is not None and is_approximate(index):
+            indices = _approximate_search(index, attribute_filter, embeddings, query_embeddings[rows],
+                                          requests[rows[0]], k, count, selector, **params)
+        else:
+            _, indices = index.search(query_embeddings[rows], k, params=search_parameters(index, selector, **params))
+
+        for row, ids in zip(rows, indices):
+            ids = ids[ids >= 0]
+            results[row] = ids[:requests[row].max_results]
+
+    return results
+
+def _approximate_search(index: faiss.Index, attribute_filter: AttributeFilter, embeddings: Optional[np.ndarray],
+                        queries: np.ndarray, request: SearchRequest, k: int, count: int, selector: faiss.IDSelector,
+                        **params) -> np.ndarray:
+    """Filtered HNSW/IVF search that still fills `k` results under selective filters.
+
+    The graph walk or the probed lists can reach fewer than `k` eligible IDs, and
+    FAISS pads the rest with -1. Filters passing at most `exact_filter_fraction`
+    of the index are ranked exactly over the eligible rows instead. Otherwise
+    queries that come back short are searched again with `ef_search`/`nprobe`
+    scaled by the filter's selectivity, and ranked exactly if still short.
+    """
+    params = {**SEARCH_PARAMS, **params}
+    if embeddings is not None and count <= params["exact_filter_fraction"] * index.ntotal:
+        return _exact_search(attribute_filter, embeddings, queries, request, k)
+
+    _, indices = index.search(queries, k, params=search_parameters(index, selector, **params))
+    short = (indices >= 0).sum(axis=1) < k
+    if short.any():
+        scale = -(-index.ntotal // max(count, 1))
+        wider = {**params, "ef_search": min(index.ntotal, params["ef_search"] * scale),
+                 "nprobe": params["nprobe"] * scale}
+        _, retried = index.search(queries[short], k, params=search_parameters(index, selector, **wider))
+        indices[short] = retried
+        short = (indices >= 0).sum(axis=1) < k
+    if short.any() and embeddings is not None:
+        indices[short] = _exact_search(attribute_filter, embeddings, queries[short], request, k)
+    return indices
+
+def _binary_search(index: faiss.IndexBinary, attribute_filter: AttributeFilter, embeddings: Optional[np.ndarray],
+                   queries: np.ndarray, request: SearchRequest, k: int, count: int, **params) -> np.ndarray:
+    """Hamming search for candidates, re-ranked by exact L2 distance on the float embeddings.
+
+    FAISS binary indexes take no ID selector, so the filter is applied to the
+    candidates, which are oversampled by `rerank_factor` and by the filter's
+    selectivity. Queries left with fewer than `k` eligible candidates rank every
+    eligible ID exactly instead.
+    """
+    if embeddings is None:
+        raise ValueError("Binary indexes need the float embeddings to re-rank candidates")
+    catalog = attribute_filter.catalog
+    rerank_factor = {**SEARCH_PARAMS, **params}["rerank_factor"]
+    candidates = min(index.ntotal, k * rerank_factor * -(-len(attribute_filter) // max(count, 1)))
+    _, found = search_index(index, queries, candidates)
+
+    results = np.full((len(queries), k), -1, dtype='int64')
+    short = []
+    for row, (query, ids) in enumerate(zip(queries, found)):
+        ids = ids[ids >= 0]
+        ids = ids[attribute_filter.eligible(ids, request)]
+        if len(ids) < k:
+            short.append(row)
+            continue
+        results[row] = _rank(catalog, embeddings, ids, query, k)
+    if short:
+        results[short] = _exact_search(attribute_filter, embeddings, queries[short], request, k)
+    return results
+
+def _exact_search(attribute_filter: AttributeFilter, embeddings: np.ndarray, queries: np.ndarray,
+                  request: SearchRequest, k: int) -> np.ndarray:
+    """Top `k` IDs (padded with -1) of every eligible assessment, by exact L2 distance"""
+    catalog = attribute_filter.catalog
+    eligible = catalog.ids[attribute_filter.eligible(catalog.ids, request)]
+    results = np.full((len(queries), k), -1, dtype='int64')
+    for row, query in enumerate(queries):
+        ranked = _rank(catalog, embeddings, eligible, query, k)
+        results[row, :len(ranked)] = ranked
+    return results
+
+def _rank(catalog: ColumnarCatalog, embeddings: np.ndarray, ids: np.ndarray, query: np.ndarray,
+          k: int) -> np.ndarray:
+    vectors = np.asarray(embeddings[catalog.rows_for(ids)], dtype='float32')
+    return ids[np.argsort(((vectors - query) ** 2).sum(axis=1), kind='stable')[:k]]
+
+def hybrid_search(index: faiss.Index, attribute_filter: AttributeFilter, lexical: BM25Index, embeddings: np.ndarray,
+                  query_embeddings: np.ndarray, requests: List[SearchRequest],
+                  lexical_candidates: int = 100, rrf_k: int = 60) -> List[np.ndarray]:
+    """Fuse dense and BM25 rankings with weighted reciprocal rank fusion.
+
+    The candidate pool of each query is its BM25 top `lexical_candidates` plus its
+    dense top `max_results` from FAISS. Dense distances are then computed exactly,
+    from the embedding matrix, for that pool only, rather than ranking the whole
+    catalog. Requests with `lexical_weight == 0` are plain dense searches, and
+    requests with `dense_weight == 0` never touch FAISS.
+    """
+    dense_rows = [row for row, r in enumerate(requests) if r.dense_weight > 0]
+    with span("dense_search"):
+        dense = filtered_search(index, attribute_filter, query_embeddings[dense_rows],
+                                [requests[row] for row in dense_rows], embeddings)
+    dense_by_row = dict(zip(dense_rows, dense))
+
+    results = []
+    for row, request in enumerate(requests):
+        if request.lexical_weight <= 0:
+            results.append(dense_by_row[row])
+            continue
+
+        with span("lexical_search"):
+            lexical_ids, _ = lexical.search(request.query, lexical_candidates)
+            lexical_ids = lexical_ids[attribute_filter.eligible(lexical_ids, request)]
+        if request.dense_weight <= 0:
+            results.append(lexical_ids[:request.max_results])
+            continue
+
+        with span("fusion"):
+            results.append(_fuse(request, dense_by_row[row], lexical_ids, lexical, embeddings,
+                                 query_embeddings[row], rrf_k))
+
+    return results
+
+def _fuse(request: SearchRequest, dense_ids: np.ndarray, lexical_ids: np.ndarray, lexical: BM25Index,
+          embeddings: np.ndarray, query_embedding: np.ndarray, rrf_k: int) -> np.ndarray:
+    """Weighted RRF over the union of one query's dense and BM25 candidates"""
+    pool = np.unique(np.concatenate([dense_ids, lexical_ids]))
+    if not len(pool):
+        return pool
+
+    vectors = np.asarray(embeddings[lexical.rows_for(pool)], dtype='float32')
+    distances = ((vectors - query_embedding) ** 2).sum(axis=1)
+    dense_rank = np.empty(len(pool), dtype='float32')
+    dense_rank[np.argsort(distances, kind='stable')] = np.arange(len(pool))
+
+    # Pool members missing from the BM25 list get no lexical contribution
+    lexical_score = np.zeros(len(pool), dtype='float32')
+    lexical_score[np.searchsorted(pool, lexical_ids)] = \
+        request.lexical_weight / (rrf_k + 1 + np.arange(len(lexical_ids), dtype='float32'))
+
+    scores = request.dense_weight / (rrf_k + 1 + dense_rank) + lexical_score
+    return pool[np.argsort(-scores, kind='stable')[:request.max_results]]
@@ -0,0 +1,51 @@
+"""Multi-process API server sharing one memory-mapped index.
+
+    python serve.py --workers 4
+
+The parent brings the persisted index up to date once, in a short-lived child
+process, and then starts the uvicorn workers with INDEX_MMAP=1. Each worker maps
+index.faiss, embeddings.npy and catalog.bin read-only, so those pages are held
+once in the page cache however many workers run, and no worker ever builds.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+def prepare_index(catalog: str = None):
+    """Build or update the persisted index outside this process, so its memory is returned"""
+    command = [sys.executable, "init_vectorstore.py"]
+    if catalog:
+        command += ["--catalog", catalog]
+    subprocess.run(command, check=True)
+    # Recompute precomputed results for the new index version, if there are any
+    subprocess.run([sys.executable, "precompute.py", "--refresh"] + command[2:], check=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from several workers sharing a memory-mapped index")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--catalog", help="Catalog JSON to index (default: data/catalog.json)")
+    parser.add_argument("--no-mmap", action="store_true", help="Give every worker its own heap copy of the index")
+    parser.add_argument("--skip-build", action="store_true", help="Serve the persisted index as it is")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.skip_build:
+        logger.info("Preparing the persisted index")
+        prepare_index(args.catalog)
+
+    # Inherited by the workers, which import api.py and load the index from disk
+    os.environ["INDEX_MMAP"] = "0" if args.no_mmap else "1"
+    if args.catalog:
+        os.environ["CATALOG_PATH"] = args.catalog
+
+    import uvicorn
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
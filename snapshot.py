@@ -0,0 +1,155 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from init_vectorstore import (CATALOG_PATH, INDEX_DIR, METADATA_FILE, assessment_text, catalog_hash, load_catalog_store,
+                              load_embeddings, load_lexical_index, prepare_vectorstore)
+from search import AttributeFilter
+
+logger = logging.getLogger(__name__)
+
+class Snapshot:
+    """One index version: the FAISS index, its catalog and everything derived from them.
+
+    A snapshot is never modified. Requests take the live snapshot once and use it
+    throughout, so a swap never mixes two versions within one response.
+    """
+
+    def __init__(self, index: faiss.Index, metadata: Dict[int, Dict], index_dir: str = INDEX_DIR):
+        self.index = index
+        self.metadata = metadata
+        self.version = catalog_hash(metadata)
+        self.catalog = load_catalog_store(metadata, index_dir)
+        self.attribute_filter = AttributeFilter(self.catalog)
+        self.lexical_index = load_lexical_index(metadata, index_dir)
+        self.embeddings = load_embeddings(index_dir)
+        self.loaded_at = time.time()
+
+    def texts(self, ids: np.ndarray) -> List[str]:
+        """Embedded text of the assessments `ids`, as paired with queries for cross-encoder scoring"""
+        return [assessment_text(record) for record in self.catalog.records(self.catalog.rows_for(ids))]
+
+class SnapshotManager:
+    """Holds the live snapshot and replaces it after a background reload.
+
+    `reload` loads the persisted index on a background thread, building or
+    updating it first if the catalog changed, and then swaps the new snapshot in
+    with a single reference assignment. Requests already holding the old snapshot
+    finish on it. `watch` polls the catalog and the index sidecar and reloads when
+    either changes. Callbacks given to `on_swap` run after each swap.
+    """
+
+    def __init__(self, model, snapshot: Snapshot, catalog_path: str = CATALOG_PATH, index_dir: str = INDEX_DIR):
+        self.model = model
+        self.current = snapshot
+        self.catalog_path = catalog_path
+        self.index_dir = index_dir
+        self.callbacks: List[Callable[[Snapshot], None]] = []
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.watcher: Optional[threading.Thread] = None
+        self.watched: Sequence[str] = (catalog_path, os.path.join(index_dir, METADATA_FILE))
+        self.signature = self._signature()
+
+        # Status
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.swaps = 0
+        self.last_reload_seconds: Optional[float] = None
+
+    def _signature(self) -> Tuple:
+        signature = []
+        for path in self.watched:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def on_swap(self, callback: Callable[[Snapshot], None]):
+        self.callbacks.append(callback)
+
+    @property
+    def reloading(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def reload(self, rebuild: bool = False) -> bool:
+        """Start a background reload; returns False if one is already running"""
+        with self.lock:
+            if self.reloading:
+                return False
+            self.state = "reloading"
+            self.thread = threading.Thread(target=self._reload, args=(rebuild,), name="index-reload", daemon=True)
+            self.thread.start()
+        return True
+
+    def _reload(self, rebuild: bool):
+        start = time.perf_counter()
+        try:
+            index, metadata = prepare_vectorstore(self.model, self.catalog_path, rebuild)
+            snapshot = Snapshot(index, metadata, self.index_dir)
+            if snapshot.version == self.current.version and not rebuild:
+                logger.info(f"Index version {snapshot.version[:12]} is unchanged")
+            else:
+                self.swap(snapshot)
+            self.state = "idle"
+            self.error = None
+        except Exception as e:
+            logger.exception("Index reload failed, still serving the previous version")
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            # Our own build rewrites the sidecar; that must not trigger another reload
+            self.signature = self._signature()
+            self.last_reload_seconds = time.perf_counter() - start
+
+    def swap(self, snapshot: Snapshot):
+        """Make `snapshot` live and notify the callbacks"""
+        previous = self.current
+        self.current = snapshot
+        self.swaps += 1
+        logger.info(f"Swapped index version {previous.version[:12]} for {snapshot.version[:12]}")
+        for callback in self.callbacks:
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.exception("Snapshot swap callback failed")
+
+    def watch(self, interval: float, paths: Optional[Sequence[str]] = None):
+        """Poll `paths` (default: the catalog and the index sidecar) every `interval` seconds
+        and reload when any of them changes"""
+        if self.watcher is not None:
+            return
+        if paths is not None:
+            self.watched = tuple(paths)
+            self.signature = self._signature()
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                signature = self._signature()
+                if signature != self.signature and not self.reloading:
+                    logger.info("Catalog or index files changed, reloading")
+                    self.signature = signature
+                    self.reload()
+
+        self.watcher = threading.Thread(target=poll, name="index-watch", daemon=True)
+        self.watcher.start()
+
+    def status(self) -> Dict:
+        return {
+            "version": self.current.version,
+            "loaded_at": self.current.loaded_at,
+            "count": len(self.current.metadata),
+            "state": self.state,
+            "error": self.error,
+            "swaps": self.swaps,
+            "last_reload_seconds": self.last_reload_seconds,
+            "watching": list(self.watched) if self.watcher is not None else []
+        }
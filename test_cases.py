@@ -14,33 +14,18 @@ test_queries = [
 ]
 
 if __name__ == "__main__":
-    from evaluation import calculate_recall_at_k, calculate_map_at_k
-    from app import get_recommendations, load_model_and_index
+    from evaluation import evaluate
+    from init_vectorstore import init_vectorstore
     
-    model, index, metadata = load_model_and_index()
+    index, model, metadata = init_vectorstore()
     
-    total_recall = 0
-    total_map = 0
+    # One batched search over every test query
+    scores = evaluate(model, index, metadata, test_queries, ks=[3], per_query=True)
     
-    for test_case in test_queries:
-        results = get_recommendations(
-            test_case["query"], 
-            model, 
-            index, 
-            metadata,
-            k=3
-        )
-        
-        recommended = results['Assessment Name'].tolist()
-        recall = calculate_recall_at_k(test_case["relevant"], recommended, k=3)
-        map_score = calculate_map_at_k(test_case["relevant"], recommended, k=3)
-        
-        total_recall += recall
-        total_map += map_score
-        
+    for i, test_case in enumerate(test_queries):
         print(f"Query: {test_case['query'][:100]}...")
-        print(f"Recall@3: {recall:.3f}")
-        print(f"MAP@3: {map_score:.3f}\n")
+        print(f"Recall@3: {scores['recall@3'][i]:.3f}")
+        print(f"MAP@3: {scores['map@3'][i]:.3f}\n")
     
-    print(f"Mean Recall@3: {total_recall/len(test_queries):.3f}")
-    print(f"Mean MAP@3: {total_map/len(test_queries):.3f}")
\ No newline at end of file
+    print(f"Mean Recall@3: {scores['recall@3'].mean():.3f}")
+    print(f"Mean MAP@3: {scores['map@3'].mean():.3f}")
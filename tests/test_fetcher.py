@@ -0,0 +1,151 @@
+"""PageFetcher against a local stand-in server over `httpx.MockTransport`"""
+import asyncio
+import os
+from typing import List
+
+import httpx
+import pytest
+
+from fetcher import FetchError, PageFetcher
+
+BASE = "http://stand-in"
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 08:00:00 GMT"
+LATENCY = 0.05
+MAX_BYTES = 64 * 1024
+LARGE_CHUNKS = 256
+CHUNK_BYTES = 4096
+
+def page(n: int, paragraphs: int = 3) -> bytes:
+    body = "".join(f"<p>Page {n} paragraph {i}: Java, SQL and stakeholder skills.</p>" for i in range(paragraphs))
+    return f"<html><head><script>ignored()</script></head><body>{body}</body></html>".encode("utf-8")
+
+class StandIn:
+    """Mock server: /page/<n> pages with validators, /large streamed in chunks, /missing and /broken fail.
+
+    `status` overrides the answer to every request, to simulate an outage or a removed page.
+    """
+
+    def __init__(self, latency: float = LATENCY):
+        self.latency = latency
+        self.requests: List[httpx.Request] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.large_bytes_sent = 0
+        self.status = None
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+        path = request.url.path
+        if self.status is not None:
+            return httpx.Response(self.status)
+        if path == "/missing":
+            return httpx.Response(404)
+        if path == "/broken":
+            raise httpx.ConnectError("connection refused", request=request)
+        if path == "/large":
+            return httpx.Response(200, headers={"Content-Type": "text/html; charset=utf-8"}, content=self._large())
+        if request.headers.get("If-None-Match") == ETAG or request.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            return httpx.Response(304)
+        return httpx.Response(200, content=page(int(path.rsplit("/", 1)[1])),
+                              headers={"ETag": ETAG, "Last-Modified": LAST_MODIFIED,
+                                       "Content-Type": "text/html; charset=utf-8"})
+
+    async def _large(self):
+        paragraph = b"<p>" + b"x" * (CHUNK_BYTES - 7) + b"</p>"
+        for _ in range(LARGE_CHUNKS):
+            self.large_bytes_sent += len(paragraph)
+            yield paragraph
+
+@pytest.fixture
+def server():
+    return StandIn()
+
+@pytest.fixture
+def run(server, tmp_path):
+    """Run a coroutine function with a fresh PageFetcher over the stand-in, revalidating on every fetch"""
+    def run(test, max_connections: int = 10):
+        async def main():
+            fetcher = PageFetcher(cache_dir=str(tmp_path), max_bytes=MAX_BYTES, max_connections=max_connections,
+                                  fresh_for=0, transport=httpx.MockTransport(server.handle))
+            try:
+                return await test(fetcher)
+            finally:
+                await fetcher.aclose()
+        return asyncio.run(main())
+    return run
+
+def test_revalidates_with_validators_and_reuses_text_on_304(server, run):
+    async def test(fetcher):
+        return await fetcher.fetch(f"{BASE}/page/0"), await fetcher.fetch(f"{BASE}/page/0")
+
+    first, second = run(test)
+    assert "Page 0 paragraph 2" in first and "ignored" not in first
+    assert second == first
+    revalidation = server.requests[-1]
+    assert revalidation.headers.get("If-None-Match") == ETAG
+    assert revalidation.headers.get("If-Modified-Since") == LAST_MODIFIED
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_serves_stale_copy_on_transient_errors(server, run, status):
+    async def test(fetcher):
+        first = await fetcher.fetch(f"{BASE}/page/0")
+        server.status = status
+        stale = await fetcher.fetch(f"{BASE}/page/0")
+        server.status = None
+        return first, stale, await fetcher.fetch(f"{BASE}/page/0")
+
+    first, stale, after = run(test)
+    assert stale == first
+    # The entry survived, so the next fetch still revalidates
+    assert after == first and server.requests[-1].headers.get("If-None-Match") == ETAG
+
+def test_client_error_drops_cached_copy(server, run, tmp_path):
+    async def test(fetcher):
+        await fetcher.fetch(f"{BASE}/page/0")
+        server.status = 404
+        with pytest.raises(FetchError):
+            await fetcher.fetch(f"{BASE}/page/0")
+        server.status = None
+        return await fetcher.fetch(f"{BASE}/page/0")
+
+    assert "Page 0 paragraph 0" in run(test)
+    # Refetched from scratch, without validators
+    assert "If-None-Match" not in server.requests[-1].headers
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_stops_downloading_at_byte_cap(server, run):
+    async def test(fetcher):
+        return await fetcher.fetch(f"{BASE}/large")
+
+    text = run(test)
+    assert 0 < len(text) <= MAX_BYTES
+    assert server.large_bytes_sent < LARGE_CHUNKS * CHUNK_BYTES
+
+def test_fetch_many_overlaps_requests_and_isolates_failures(server, run):
+    urls = [f"{BASE}/page/{n}" for n in range(1, 51)]
+    urls[1], urls[2] = f"{BASE}/missing", f"{BASE}/broken"
+
+    async def test(fetcher):
+        return await fetcher.fetch_many(urls)
+
+    texts = run(test, max_connections=10)
+    assert server.peak_in_flight == 10
+    assert texts[1] == "" and texts[2] == ""
+    assert all(f"Page {n} paragraph 0" in texts[n - 1] for n in range(1, len(urls) + 1) if n not in (2, 3))
+
+def test_failure_without_cached_copy_raises(run):
+    async def test(fetcher):
+        with pytest.raises(FetchError):
+            await fetcher.fetch(f"{BASE}/missing")
+        with pytest.raises(FetchError):
+            await fetcher.fetch(f"{BASE}/broken")
+
+    run(test)
@@ -0,0 +1,71 @@
+"""Filtered dense search on every index backend, against brute force over the eligible rows"""
+import numpy as np
+import pytest
+
+from benchmarks.common import TEST_TYPES, synthetic_catalog, synthetic_embeddings
+from catalog import ColumnarCatalog
+from indexes import BACKENDS, make_index
+from search import AttributeFilter, SearchRequest, filtered_search
+
+N = 5000
+DIMENSION = 32
+K = 10
+RARE_DURATION = 7  # given to 30 items only
+
+@pytest.fixture(scope="module")
+def catalog():
+    records = synthetic_catalog(N)
+    for record in records[::N // 30][:30]:
+        record["duration"] = RARE_DURATION
+    return ColumnarCatalog.from_records(records, range(N))
+
+@pytest.fixture(scope="module")
+def embeddings():
+    return synthetic_embeddings(N, DIMENSION)
+
+@pytest.fixture(scope="module")
+def queries():
+    return synthetic_embeddings(20, DIMENSION, seed=1)
+
+@pytest.fixture(scope="module")
+def indexes(embeddings):
+    return {backend: make_index(DIMENSION, embeddings, np.arange(N), backend, pq_m=8, nlist=64)
+            for backend in BACKENDS}
+
+def brute_force(catalog, attribute_filter, embeddings, query, request):
+    ids = catalog.ids[attribute_filter.eligible(catalog.ids, request)]
+    vectors = embeddings[catalog.rows_for(ids)]
+    return ids[np.argsort(((vectors - query) ** 2).sum(axis=1), kind='stable')[:request.max_results]]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_selective_filter_matches_brute_force(backend, catalog, embeddings, queries, indexes):
+    attribute_filter = AttributeFilter(catalog)
+    request = SearchRequest("query", K, max_duration=RARE_DURATION)
+    assert attribute_filter.lookup(request)[0] == 30
+
+    results = filtered_search(indexes[backend], attribute_filter, queries, [request] * len(queries), embeddings)
+    for query, ids in zip(queries, results):
+        expected = brute_force(catalog, attribute_filter, embeddings, query, request)
+        if backend in ("flat_fp16", "flat_sq8"):
+            # Ranked on reduced-precision vectors, so near ties may swap
+            assert len(ids) == K and attribute_filter.eligible(ids, request).all()
+            assert len(np.intersect1d(ids, expected)) >= K - 2
+        else:
+            np.testing.assert_array_equal(ids, expected)
+
+@pytest.mark.parametrize("backend", ["hnsw", "ivf_flat", "ivf_pq"])
+@pytest.mark.parametrize("with_embeddings", [True, False])
+def test_short_results_are_retried(backend, with_embeddings, catalog, embeddings, queries, indexes):
+    """Filters above the exact-search cutoff still fill every result slot with eligible IDs"""
+    attribute_filter = AttributeFilter(catalog)
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        request = SearchRequest("query", K, max_duration=int(rng.choice([10, 15, 20, 30])),
+                                remote_testing=bool(rng.random() < 0.5), adaptive=bool(rng.random() < 0.5),
+                                test_types=(str(rng.choice(TEST_TYPES)),))
+        count, _ = attribute_filter.lookup(request)
+        results = filtered_search(indexes[backend], attribute_filter, queries, [request] * len(queries),
+                                  embeddings if with_embeddings else None, exact_filter_fraction=0.0)
+        for ids in results:
+            assert len(ids) == min(K, count)
+            assert attribute_filter.eligible(ids, request).all()